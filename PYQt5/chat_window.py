@@ -2,8 +2,9 @@ from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                            QLineEdit, QPushButton, QComboBox, QCompleter,
                            QListWidget, QLabel, QMenu, QAction, QProgressBar, 
                            QTextEdit, QSystemTrayIcon, QListWidgetItem, QStyle)
-from PyQt5.QtCore import Qt, QStringListModel, QTimer
+from PyQt5.QtCore import Qt, QStringListModel, QTimer, QThread, pyqtSignal
 from PyQt5.QtGui import QIcon
+import html
 import json
 from datetime import datetime
 import logging
@@ -36,6 +37,22 @@ class LoadingOverlay(QWidget):
     def showEvent(self, event):
         self.setGeometry(self.parent().rect())
 
+class CommandWorker(QThread):
+    """Runs a chat command off the GUI thread, /search waits on the log QA service"""
+    response_ready = pyqtSignal(str)
+    failed = pyqtSignal(object)
+
+    def __init__(self, chat_service, command, parent=None):
+        super().__init__(parent)
+        self.chat_service = chat_service
+        self.command = command
+
+    def run(self):
+        try:
+            self.response_ready.emit(self.chat_service.process_command(self.command))
+        except Exception as e:
+            self.failed.emit(e)
+
 class ChatWindow(QMainWindow):
     APP_VERSION = "1.0.0"
     
@@ -95,6 +112,7 @@ class ChatWindow(QMainWindow):
         self.timer = QTimer()
         self.timer.timeout.connect(self.handle_response)
         self.current_message = None
+        self.command_worker = None
         self.is_dark_mode = True
         self.notification_count = 0
         self.current_theme = self.DARK_THEME
@@ -197,6 +215,9 @@ class ChatWindow(QMainWindow):
         except Exception as e:
             logging.error(f"Unexpected error during logout: {str(e)}")
         finally:
+            if self.command_worker is not None:
+                # Bounded by the service timeout
+                self.command_worker.wait()
             self.tray_icon.hide()
             event.accept()
 
@@ -690,22 +711,44 @@ class ChatWindow(QMainWindow):
         self.current_message = command
         self.show_notification("Processing Command", f"Executing command: {command}")
         
+        if command.startswith("/search"):
+            # A real network call, nothing to simulate
+            self.start_command_worker()
+            return
         # Simulate 2-second delay for commands
         self.timer.timeout.connect(self.handle_command_response)
         self.timer.start(2000)
 
     def handle_command_response(self):
+        self.timer.stop()
+        self.timer.timeout.disconnect(self.handle_command_response)
+        self.timer.timeout.connect(self.handle_response)
+        self.start_command_worker()
+
+    def start_command_worker(self):
+        # The command may wait on a network service, keep the window responsive meanwhile
+        self.command_worker = CommandWorker(self.chat_service, self.current_message)
+        self.command_worker.response_ready.connect(self.show_command_response)
+        self.command_worker.failed.connect(self.show_command_error)
+        self.command_worker.start()
+
+    def show_command_error(self, error):
+        try:
+            if isinstance(error, CommandError):
+                self.show_error("Command Error", error)
+            else:
+                self.show_error("Unexpected Error", f"An unexpected error occurred: {str(error)}")
+        finally:
+            self.hide_loading()
+            self.progress.hide()
+
+    def show_command_response(self, response):
         try:
-            self.timer.stop()
-            self.timer.timeout.disconnect(self.handle_command_response)
-            self.timer.timeout.connect(self.handle_response)
-            
-            command = self.current_message
             timestamp = datetime.now().strftime("%m/%d/%Y %H:%M:%S")
             
-            response = self.chat_service.process_command(command)
-            
             logging.info(f"Command Response: {response}")
+            # Responses are plain text, log answers included: escape them rather than render them
+            response = html.escape(response).replace("\n", "<br>")
             self.chat_display.append(f"""
                 <div style='background-color: #1D4BA3; padding: 10px; border-radius: 8px; margin: 5px 0;
                      border-left: 4px solid #e74c3c;'>
@@ -717,8 +760,6 @@ class ChatWindow(QMainWindow):
                     </table>
                 </div>
             """)
-        except CommandError as e:
-            self.show_error("Command Error", e)
         except Exception as e:
             self.show_error("Unexpected Error", f"An unexpected error occurred: {str(e)}")
         finally:
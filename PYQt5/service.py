@@ -1,7 +1,15 @@
+import json
 import logging
+import socket
 from datetime import datetime
 import webbrowser
+from urllib.error import HTTPError, URLError
 from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+# Log QA service started with `python qa_server.py LOG_DIR` (see qa_server.py)
+QA_SERVER_URL = "http://127.0.0.1:8765"
+QA_TIMEOUT_SECONDS = 5
 
 class ChatServiceError(Exception):
     """Base exception for chat service errors"""
@@ -127,7 +135,7 @@ class ChatService:
             elif command.startswith("/help"):
                 return "ℹ️ Available commands:\n" + "\n".join(self.command_list)
             elif command.startswith("/search"):
-                return "🔍 Search results found!"
+                return self._search_logs(command[len("/search"):].strip())
             elif command.startswith("/text"):
                 return "📝 Text processing complete!"
             elif command.startswith("/image"):
@@ -139,6 +147,31 @@ class ChatService:
             logging.error(f"Command processing error: {str(e)}")
             raise CommandError(f"Failed to process command: {str(e)}")
 
+    def _search_logs(self, question):
+        """Answer a question over the logs with the running QA service"""
+        if not question:
+            return "🔍 Usage: /search <question about the logs>"
+        request = Request(f"{QA_SERVER_URL}/answer", data=json.dumps({"question": question}).encode("utf-8"),
+                          headers={"Content-Type": "application/json"}, method="POST")
+        try:
+            with urlopen(request, timeout=QA_TIMEOUT_SECONDS) as response:
+                result = json.loads(response.read().decode("utf-8"))
+        except HTTPError as e:
+            logging.error(f"QA service error: {str(e)}")
+            return "🔍 Log search failed, check admin"
+        except (URLError, OSError) as e:
+            # urlopen wraps errors raised while connecting in URLError, those while reading are raised as is
+            reason = e.reason if isinstance(e, URLError) else e
+            logging.error(f"QA service unavailable: {str(e)}")
+            if isinstance(reason, (socket.timeout, TimeoutError)):
+                return f"🔍 Log search timed out after {QA_TIMEOUT_SECONDS}s, the service is busy, try again"
+            if isinstance(reason, ConnectionRefusedError):
+                return "🔍 Log search service is not running"
+            return f"🔍 Log search service is unreachable: {reason}"
+        if not result.get("answer"):
+            return "🔍 No answer found in the logs"
+        return f"🔍 {result['answer']}\n({result['file']}:{result['line']})"
+
     def process_message(self, message):
         try:
             # Here you can add more complex message processing logic
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Answers kept in memory, and how long an answer stays valid
+DEFAULT_MEMORY_ENTRIES = 4096
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+def answer_key(model_name, question, context, settings=''):
+    """Address of a (question, context) pair for a model and reader settings"""
+    context_hash = hashlib.sha256(context.encode('utf-8')).hexdigest()
+    payload = f"{model_name}\0{settings}\0{question.strip()}\0{context_hash}".encode('utf-8')
+    return hashlib.sha256(payload).digest()
+
+
+def source_signature(path):
+    """Inode of a log file; once the path holds another file the answers read from it are dropped.
+
+    Size and mtime are left out on purpose: appending to a live log must not
+    invalidate the answers for lines that did not change, and the context hash
+    in the key already decides whether an answer still applies.
+    """
+    if path is None:
+        return ''
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 'missing'
+    return str(stat.st_ino)
+
+
+class AnswerCache:
+    """Two-tier cache of reader results.
+
+    An in-memory LRU dict answers repeated questions without touching disk; a
+    SQLite table (when path is given) keeps answers across runs. Every entry
+    expires after ttl_seconds, and an entry read from a log file is dropped as
+    soon as that path holds a different file (another inode, e.g. after rotation).
+    """
+
+    def __init__(self, path=None, model_name='', memory_entries=DEFAULT_MEMORY_ENTRIES,
+                 ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.model_name = model_name
+        self.memory_entries = memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS answers (
+                    key BLOB PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    source TEXT,
+                    signature TEXT NOT NULL,
+                    expires REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS answers_source ON answers (source)")
+            self._conn.commit()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, questions, contexts, sources=None, settings=''):
+        """Return a cached result dict per pair, or None where there is none (or it is stale)"""
+        sources = sources or [None] * len(contexts)
+        now = time.time()
+        signatures = {}
+        results = []
+        stale = []
+        with self._lock:
+            for question, context, source in zip(questions, contexts, sources):
+                key = answer_key(self.model_name, question, context, settings)
+                if source not in signatures:
+                    signatures[source] = source_signature(source)
+                entry = self._memory.get(key)
+                from_disk = False
+                if entry is None and self._conn is not None:
+                    row = self._conn.execute("SELECT result, signature, expires FROM answers WHERE key = ?",
+                                             (key,)).fetchone()
+                    if row is not None:
+                        entry = (json.loads(row[0]), row[1], row[2])
+                        from_disk = True
+                if entry is not None and (entry[2] < now or entry[1] != signatures[source]):
+                    stale.append(key)
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                if from_disk:
+                    self.disk_hits += 1
+                else:
+                    self.memory_hits += 1
+                self._remember(key, entry)
+                results.append(dict(entry[0]))
+            if stale:
+                self._forget(stale)
+        return results
+
+    def put_many(self, questions, contexts, results, sources=None, settings=''):
+        sources = sources or [None] * len(contexts)
+        expires = time.time() + self.ttl_seconds
+        signatures = {source: source_signature(source) for source in set(sources)}
+        rows = []
+        with self._lock:
+            for question, context, result, source in zip(questions, contexts, results, sources):
+                key = answer_key(self.model_name, question, context, settings)
+                self._remember(key, (dict(result), signatures[source], expires))
+                rows.append((key, json.dumps(result), source, signatures[source], expires))
+            if self._conn is not None:
+                self._conn.executemany("INSERT OR REPLACE INTO answers (key, result, source, signature, expires) "
+                                       "VALUES (?, ?, ?, ?, ?)", rows)
+                self._conn.commit()
+
+    def _forget(self, keys):
+        for key in keys:
+            self._memory.pop(key, None)
+        if self._conn is not None:
+            # One transaction for the whole batch
+            self._conn.executemany("DELETE FROM answers WHERE key = ?", [(key,) for key in keys])
+            self._conn.commit()
+
+    def invalidate_source(self, source):
+        """Drop every answer read from the given log file"""
+        with self._lock:
+            # Memory entries do not keep their source, so clear the tier; it refills from disk
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM answers WHERE source = ?", (source,))
+                self._conn.commit()
+
+    def purge_expired(self):
+        with self._lock:
+            now = time.time()
+            for key in [key for key, entry in self._memory.items() if entry[2] < now]:
+                del self._memory[key]
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM answers WHERE expires < ?", (now,))
+                self._conn.commit()
+
+    def stats(self):
+        total = self.memory_hits + self.disk_hits + self.misses
+        with self._lock:
+            entries = (self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+                       if self._conn is not None else len(self._memory))
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / total if total else 0.0,
+            'memory_entries': len(self._memory),
+            'entries': entries,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,277 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+import inference_backends
+from phrasebank import load_phrasebank
+
+SCENARIOS = ('embed', 'qa')
+LENGTH_DISTRIBUTIONS = ('source', 'lognormal', 'fixed')
+
+_LEVELS = ['INFO'] * 6 + ['WARN'] * 2 + ['ERROR', 'DEBUG']
+_COMPONENTS = ['kernel', 'sshd', 'wifi', 'ActivityManager', 'PowerManager', 'dhcpd', 'cron', 'db-pool']
+
+
+def read_sentences():
+    """Unique sentences of the Financial PhraseBank files, the text source of the synthetic logs"""
+    return load_phrasebank().sentences()
+
+
+def synthetic_log_lines(lines, sentences, length_distribution='source', mean_words=20, max_words=200, seed=0):
+    """Generate log lines with a timestamp, level, component and pid around sentence text.
+
+    The message length follows the source sentences ('source'), a lognormal with
+    the given mean ('lognormal', long-tailed like real logs) or is always
+    mean_words ('fixed'); longer messages are stitched from several sentences.
+    """
+    rng = np.random.default_rng(seed)
+    words = [sentence.split() for sentence in sentences]
+    if length_distribution == 'source':
+        lengths = [len(words[i]) for i in rng.integers(len(words), size=lines)]
+    elif length_distribution == 'lognormal':
+        sigma = 0.6
+        lengths = rng.lognormal(np.log(mean_words) - sigma ** 2 / 2, sigma, size=lines).round().astype(int)
+    elif length_distribution == 'fixed':
+        lengths = [mean_words] * lines
+    else:
+        raise ValueError(f"Unknown length distribution: {length_distribution}")
+
+    clock = datetime(2024, 1, 1)
+    result = []
+    for length in np.clip(lengths, 1, max_words):
+        message = []
+        while len(message) < length:
+            sentence = words[rng.integers(len(words))]
+            start = rng.integers(len(sentence))
+            message.extend(sentence[start:start + length - len(message)])
+        clock += timedelta(milliseconds=int(rng.integers(1, 5000)))
+        result.append(f"{clock:%Y-%m-%d %H:%M:%S.%f}"[:-3] + f" {_LEVELS[rng.integers(len(_LEVELS))]} "
+                      f"{_COMPONENTS[rng.integers(len(_COMPONENTS))]}[{rng.integers(100, 32768)}]: "
+                      + ' '.join(message))
+    return result
+
+
+def _peak_rss_bytes():
+    """Peak resident memory of this process, or None where it cannot be read"""
+    try:
+        import resource  # Unix only
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        memory = psutil.Process().memory_info()
+        # Windows reports the peak working set, elsewhere only the current RSS is known
+        return getattr(memory, 'peak_wset', memory.rss)
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if platform.system() == 'Darwin' else peak * 1024
+
+
+def _run_embed(lines, batch_size, backend):
+    import emdeddings
+
+    emdeddings.backend_name = backend
+    emdeddings.get_backend()
+    timings = Counter()
+    started = time.perf_counter()
+    input_ids = emdeddings.tokenize_lines(lines)
+    timings['tokenize'] = time.perf_counter() - started
+    emdeddings.embed_encoded(input_ids, batch_size=batch_size, timings=timings)
+    elapsed = time.perf_counter() - started
+    return elapsed, timings, sum(len(ids) for ids in input_ids)
+
+
+def _run_qa(lines, batch_size, backend):
+    import model_registry
+    import splunk
+
+    model = inference_backends.get_backend(backend, model_registry.QUESTION_ANSWERING, splunk.QA_MODEL_NAME)
+    tokenizer = model_registry.get_tokenizer(splunk.QA_TOKENIZER_NAME)
+    questions = [question for _ in lines for question in splunk.LOG_QUESTIONS]
+    contexts = [line for line in lines for _ in splunk.LOG_QUESTIONS]
+    timings = Counter()
+    started = time.perf_counter()
+    splunk.answer_batch(model, tokenizer, questions, contexts, batch_size=batch_size, timings=timings)
+    elapsed = time.perf_counter() - started
+    # Counted outside the timed region; the reader saw the same (question, context) windows
+    encoded = tokenizer(questions, contexts, truncation='only_second', max_length=splunk.MAX_SEQ_LENGTH,
+                        stride=splunk.DEFAULT_STRIDE, return_overflowing_tokens=True)
+    return elapsed, timings, sum(len(ids) for ids in encoded['input_ids'])
+
+
+def run_scenario(scenario, lines, batch_size=32, backend=inference_backends.EAGER, warmup_lines=32):
+    """Time one scenario over the given lines; meant to run in a fresh process so peak RSS is its own"""
+    runner = {'embed': _run_embed, 'qa': _run_qa}[scenario]
+    load_started = time.perf_counter()
+    runner(lines[:warmup_lines], batch_size, backend)  # loads the model and warms up kernels
+    load_seconds = time.perf_counter() - load_started
+    elapsed, timings, tokens = runner(lines, batch_size, backend)
+    peak_rss = _peak_rss_bytes()
+    return {
+        'scenario': scenario,
+        'backend': backend,
+        'batch_size': batch_size,
+        'lines': len(lines),
+        'tokens': tokens,
+        'seconds': elapsed,
+        'lines_per_s': len(lines) / elapsed,
+        'tokens_per_s': tokens / elapsed,
+        'stages_s': {stage: timings[stage] for stage in ('tokenize', 'forward', 'postprocess')},
+        'load_and_warmup_s': load_seconds,
+        'peak_rss_mb': peak_rss / (1 << 20) if peak_rss is not None else None,
+    }
+
+
+def _neighbours(vectors, k):
+    vectors = vectors.astype(np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, -np.inf)
+    return np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+
+
+def embedding_setting_grid(layers=(), projection_dims=()):
+    """Every pooling at full depth, then masked mean with each layer cut-off and each projection width"""
+    import emdeddings
+
+    grid = [{'pooling': pooling, 'num_layers': None, 'projection_dim': None} for pooling in emdeddings.POOLINGS]
+    grid += [{'pooling': emdeddings.MEAN, 'num_layers': n, 'projection_dim': None} for n in layers]
+    grid += [{'pooling': emdeddings.MEAN, 'num_layers': None, 'projection_dim': d} for d in projection_dims]
+    return grid
+
+
+def run_embedding_settings(lines, grid, batch_size=32, backend=inference_backends.EAGER, k=10):
+    """Storage, latency and retrieval quality of each embedding setting.
+
+    Quality is the share of every line's k nearest neighbours (cosine) under the
+    reference setting, full-depth masked mean in float32, that the setting keeps.
+    """
+    import emdeddings
+
+    emdeddings.backend_name = backend
+    input_ids = emdeddings.tokenize_lines(lines)
+    reference = None
+    results = []
+    for settings in [{'pooling': emdeddings.MEAN, 'num_layers': None, 'projection_dim': None}] + list(grid):
+        emdeddings.apply_embedding_settings(settings)
+        emdeddings.embed_encoded(input_ids[:batch_size], batch_size=batch_size)  # builds and warms the model
+        started = time.perf_counter()
+        vectors = emdeddings.embed_encoded(input_ids, batch_size=batch_size)
+        elapsed = time.perf_counter() - started
+        neighbours = _neighbours(vectors, min(k, len(lines) - 1))
+        if reference is None:
+            reference = neighbours
+            continue
+        overlap = [len(np.intersect1d(a, b)) for a, b in zip(neighbours, reference)]
+        results.append(dict(settings, backend=backend, bytes_per_vector=vectors.shape[1] * vectors.itemsize,
+                            ms_per_line=elapsed * 1000 / len(lines), lines_per_s=len(lines) / elapsed,
+                            neighbour_recall=float(np.mean(overlap)) / reference.shape[1]))
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(scenarios, lines, batch_size=32, backend=inference_backends.EAGER, embedding_grid=None):
+    """Run every scenario in its own spawned process and collect the results with run metadata"""
+    import torch
+
+    results = []
+    for scenario in scenarios:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results.append(pool.submit(run_scenario, scenario, lines, batch_size, backend).result())
+    settings = []
+    if embedding_grid:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            settings = pool.submit(run_embedding_settings, lines, embedding_grid, batch_size, backend).result()
+    return {
+        'commit': _git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'threads': torch.get_num_threads(),
+        'machine': platform.machine(),
+        'results': results,
+        'embedding_settings': settings,
+    }
+
+
+def _megabytes(value):
+    return f"{value:.0f}" if value is not None else '-'
+
+
+def compare(baseline_path, candidate_path):
+    """Print throughput and memory of a candidate run relative to a baseline run"""
+    with open(baseline_path, 'r') as file:
+        baseline = {(r['scenario'], r['backend'], r['batch_size']): r for r in json.load(file)['results']}
+    with open(candidate_path, 'r') as file:
+        candidate = json.load(file)['results']
+    print(f"{'scenario':<8} {'backend':<8} {'lines/s':>10} {'speedup':>8} {'peak MB':>9} {'vs base':>8}")
+    for result in candidate:
+        base = baseline.get((result['scenario'], result['backend'], result['batch_size']))
+        speedup = f"{result['lines_per_s'] / base['lines_per_s']:.2f}x" if base else '-'
+        memory = (f"{result['peak_rss_mb'] / base['peak_rss_mb']:.2f}x"
+                  if base and result['peak_rss_mb'] and base['peak_rss_mb'] else '-')
+        print(f"{result['scenario']:<8} {result['backend']:<8} {result['lines_per_s']:>10.1f} {speedup:>8} "
+              f"{_megabytes(result['peak_rss_mb']):>9} {memory:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput benchmark of the embedding and log QA pipelines")
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--lines', type=int, default=2000, help="synthetic log lines per scenario")
+    parser.add_argument('--length-distribution', choices=LENGTH_DISTRIBUTIONS, default='source')
+    parser.add_argument('--mean-words', type=int, default=20)
+    parser.add_argument('--max-words', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--backend', choices=inference_backends.BACKENDS, default=inference_backends.EAGER)
+    parser.add_argument('--embedding-settings', action='store_true',
+                        help="also compare pooling, layer cut-off and projection settings of the embeddings")
+    parser.add_argument('--layers', type=int, nargs='*', default=[12, 6], help="layer cut-offs to compare")
+    parser.add_argument('--projection-dims', type=int, nargs='*', default=[256, 128],
+                        help="float16 projection widths to compare")
+    parser.add_argument('--corpus-out', help="also write the synthetic log corpus to this file")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CANDIDATE'),
+                        help="compare two result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        corpus = synthetic_log_lines(args.lines, read_sentences(), length_distribution=args.length_distribution,
+                                     mean_words=args.mean_words, max_words=args.max_words, seed=args.seed)
+        if args.corpus_out:
+            with open(args.corpus_out, 'w', encoding='utf-8') as file:
+                file.writelines(line + '\n' for line in corpus)
+        grid = embedding_setting_grid(args.layers, args.projection_dims) if args.embedding_settings else None
+        report = run_benchmarks(args.scenarios, corpus, batch_size=args.batch_size, backend=args.backend,
+                                embedding_grid=grid)
+        report['corpus'] = {'lines': args.lines, 'length_distribution': args.length_distribution,
+                            'mean_words': args.mean_words, 'max_words': args.max_words, 'seed': args.seed}
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=1)
+        for result in report['results']:
+            stages = ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in result['stages_s'].items())
+            print(f"{result['scenario']:<6} {result['lines_per_s']:>9.1f} lines/s {result['tokens_per_s']:>10.0f} "
+                  f"tokens/s  peak {_megabytes(result['peak_rss_mb'])} MB  ({stages})")
+        if report['embedding_settings']:
+            print(f"{'pooling':<8} {'layers':>6} {'proj':>6} {'bytes/vec':>10} {'ms/line':>8} {'recall@10':>10}")
+        for result in report['embedding_settings']:
+            print(f"{result['pooling']:<8} {result['num_layers'] or 'all':>6} {result['projection_dim'] or '-':>6} "
+                  f"{result['bytes_per_vector']:>10} {result['ms_per_line']:>8.2f} {result['neighbour_recall']:>10.3f}")
+        print(f"results in {args.output}")
@@ -0,0 +1,127 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import numpy as np
+
+# Default on-disk budget for cached vectors
+DEFAULT_MAX_BYTES = 1 << 30  # 1 GiB
+
+
+def normalize_line(line):
+    """Collapse whitespace so lines that only differ in spacing share one entry"""
+    return ' '.join(line.split())
+
+
+def line_key(line, model_name):
+    """Content address of a line for a given model"""
+    payload = f"{model_name}\0{normalize_line(line)}".encode('utf-8')
+    return hashlib.sha256(payload).digest()
+
+
+class EmbeddingCache:
+    """On-disk cache of line embeddings stored as float32 blobs in SQLite.
+
+    Entries are keyed by a hash of the normalized line plus the model name and
+    evicted least-recently-used first once the stored vectors exceed max_bytes.
+    """
+
+    def __init__(self, path, model_name, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key BLOB PRIMARY KEY,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings (last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def get_many(self, lines):
+        """Return a list with a vector for every cached line and None for the rest"""
+        keys = [line_key(line, self.model_name) for line in lines]
+        found = {}
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk)
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?",
+                                       [(now, key) for key in found])
+                self._conn.commit()
+        result = [found.get(key) for key in keys]
+        hits = sum(vector is not None for vector in result)
+        self.hits += hits
+        self.misses += len(result) - hits
+        return result
+
+    def put_many(self, lines, vectors):
+        """Store one vector per line and evict old entries if over budget"""
+        now = time.time()
+        rows = {}
+        for line, vector in zip(lines, vectors):
+            blob = np.ascontiguousarray(vector, dtype=np.float32).tobytes()
+            rows[line_key(line, self.model_name)] = blob
+        with self._lock:
+            for key, blob in rows.items():
+                previous = self._conn.execute("SELECT size FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if previous:
+                    self._total_bytes -= previous[0]
+                self._conn.execute("INSERT OR REPLACE INTO embeddings (key, vector, size, last_access) VALUES (?, ?, ?, ?)",
+                                   (key, blob, len(blob), now))
+                self._total_bytes += len(blob)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        # Other processes may share the file, re-read the real size before evicting
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if self._total_bytes <= self.max_bytes:
+            return
+        victims = []
+        excess = self._total_bytes - self.max_bytes
+        for key, size in self._conn.execute("SELECT key, size FROM embeddings ORDER BY last_access ASC"):
+            victims.append((key,))
+            excess -= size
+            self._total_bytes -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+
+    def stats(self):
+        """Hit/miss counters and current size of the cache"""
+        total = self.hits + self.misses
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': entries,
+            'bytes': self._total_bytes,
+            'max_bytes': self.max_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,94 +1,550 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import time
 import torch
-from transformers import BertTokenizer, BertModel
 import numpy as np
+import inference_backends
+import model_registry
+from embedding_cache import DEFAULT_MAX_BYTES, EmbeddingCache, normalize_line
+from log_indexer import IncrementalLogIndexer
+from log_templates import group_templates
+from token_shards import TokenShards
 
-# Load the pre-trained model and tokenizer
+# The pre-trained model and tokenizer are loaded on first use through the registry
 model_name = 'deepset/bert-large-uncased-whole-word-masking-squad2'
-tokenizer = BertTokenizer.from_pretrained(model_name)
-model = BertModel.from_pretrained(model_name)
+# Inference backend used for the forward pass, one of inference_backends.BACKENDS
+backend_name = inference_backends.EAGER
+
+# How token vectors become one line vector: masked mean, the [CLS] token, or masked max
+MEAN = 'mean'
+CLS = 'cls'
+MAX = 'max'
+POOLINGS = (MEAN, CLS, MAX)
+pooling = MEAN
+# Stop after this many encoder layers (None runs them all)
+num_layers = None
+# Randomly project pooled vectors down to this many float16 dimensions (None keeps hidden_size float32)
+projection_dim = None
+PROJECTION_SEED = 0
+
+
+def get_tokenizer():
+    return model_registry.get_tokenizer(model_name)
+
+
+def get_model():
+    return model_registry.get_embedding_model(model_name)
+
+
+def get_backend():
+    return inference_backends.get_backend(backend_name, model_registry.EMBEDDING, model_name,
+                                          num_layers=num_layers)
+
+
+def embedding_settings():
+    """Everything that changes the vectors, handed to worker processes"""
+    return {'backend_name': backend_name, 'pooling': pooling, 'num_layers': num_layers,
+            'projection_dim': projection_dim}
+
+
+def apply_embedding_settings(settings):
+    globals().update(settings)
+
+
+def recorded_settings():
+    """embedding_settings() plus the model and projection seed, as stored with anything built on the vectors"""
+    return dict(embedding_settings(), model_name=model_name, projection_seed=PROJECTION_SEED)
+
+
+def apply_recorded_settings(settings, source):
+    """Switch to settings from recorded_settings(); ValueError if source was made with another model"""
+    if settings['model_name'] != model_name or settings['projection_seed'] != PROJECTION_SEED:
+        raise ValueError(f"{source} was embedded with {settings['model_name']} "
+                         f"(projection seed {settings['projection_seed']}), not {model_name}")
+    apply_embedding_settings({key: settings[key] for key in embedding_settings()})
+
+
+def _settings_path(output_file_path):
+    return output_file_path + '.settings.json'
+
+
+def save_embedding_settings(output_file_path):
+    """Record next to a saved matrix how its rows were made, so queries can be embedded the same way"""
+    settings = recorded_settings()
+    tmp_path = _settings_path(output_file_path) + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(settings, file)
+    os.replace(tmp_path, _settings_path(output_file_path))
+
+
+def load_embedding_settings(embeddings_path):
+    """Settings saved by save_embedding_settings, or None for a matrix written before they were recorded"""
+    try:
+        with open(_settings_path(embeddings_path), 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def apply_saved_settings(embeddings_path):
+    """Switch to the settings a saved matrix was made with; a matrix without settings used the defaults"""
+    settings = load_embedding_settings(embeddings_path)
+    if settings is None:
+        return
+    apply_recorded_settings(settings, embeddings_path)
+
+
+def cache_namespace():
+    """Name cached embeddings are keyed under; backends, pooling, layers and projection change the vectors"""
+    namespace = model_name
+    if backend_name != inference_backends.EAGER:
+        namespace += f'@{backend_name}'
+    if pooling != MEAN:
+        namespace += f'/{pooling}'
+    if num_layers:
+        namespace += f'/layers={num_layers}'
+    if projection_dim:
+        namespace += f'/proj={projection_dim}:{PROJECTION_SEED}'
+    return namespace
+
+
+def hidden_size():
+    # Read from the config so sizing an output never loads the weights
+    return model_registry.get_config(model_name).hidden_size
+
+
+def embedding_size():
+    """Width of the stored line vectors"""
+    return projection_dim or hidden_size()
+
+
+def embedding_dtype():
+    return np.float16 if projection_dim else np.float32
+
+
+def projection_matrix():
+    """Gaussian random projection from hidden_size to projection_dim, the same in every process"""
+    def build():
+        rng = np.random.default_rng(PROJECTION_SEED)
+        matrix = rng.standard_normal((hidden_size(), projection_dim), dtype=np.float32) / np.sqrt(projection_dim)
+        return torch.from_numpy(matrix.astype(np.float32))
+    return model_registry.cached(('projection', hidden_size(), projection_dim, PROJECTION_SEED), build)
+
+
+def pool(last_hidden_state, attention_mask):
+    """Reduce (batch, tokens, hidden) to (batch, hidden) with the configured pooling"""
+    if pooling == CLS:
+        return last_hidden_state[:, 0]
+    mask = attention_mask.unsqueeze(-1)
+    if pooling == MAX:
+        # Padding must never win the max
+        return last_hidden_state.masked_fill(mask == 0, float('-inf')).max(dim=1).values
+    if pooling == MEAN:
+        # Mean over real tokens only, padding must not dilute shorter lines
+        mask = mask.to(last_hidden_state.dtype)
+        return (last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+    raise ValueError(f"Unknown pooling: {pooling}, expected one of {', '.join(POOLINGS)}")
+
+
+# Number of lines sent through the model in one forward pass
+DEFAULT_BATCH_SIZE = 32
+# Number of lines read from disk and written to the output per streaming step
+DEFAULT_CHUNK_LINES = 4096
+
+
+def tokenize_lines(lines):
+    """Tokenize every line in one fast-tokenizer call, without padding, so batches can be built by length"""
+    encoded = get_tokenizer()(list(lines), truncation=True, padding=False)
+    return encoded['input_ids']
+
+
+def pad_batch(input_ids, pad_token_id):
+    """Right-pad a list of token id sequences into (ids, attention_mask) int64 arrays"""
+    width = max(len(ids) for ids in input_ids)
+    padded = np.full((len(input_ids), width), pad_token_id, dtype=np.int64)
+    attention_mask = np.zeros((len(input_ids), width), dtype=np.int64)
+    for row, ids in enumerate(input_ids):
+        padded[row, :len(ids)] = ids
+        attention_mask[row, :len(ids)] = 1
+    return padded, attention_mask
+
+
+def embed_encoded(input_ids, batch_size=DEFAULT_BATCH_SIZE, timings=None):
+    """Run the model over pre-tokenized lines and return one pooled row per line (see pool).
+
+    input_ids is a sequence of token id lists or arrays (e.g. rows of a token shard).
+    Lines are sorted by token length so each batch is padded only up to its own
+    longest member; rows are written back in the original order. A Counter passed
+    as timings accumulates seconds spent in the 'forward' and 'postprocess' stages.
+    """
+    runner = get_backend()
+    pad_token_id = runner.config.pad_token_id or 0
+    projection = projection_matrix() if projection_dim else None
+    embeddings = np.zeros((len(input_ids), embedding_size()), dtype=embedding_dtype())
+    order = sorted(range(len(input_ids)), key=lambda i: len(input_ids[i]))
+
+    with torch.inference_mode():
+        for start in range(0, len(order), batch_size):
+            batch_rows = order[start:start + batch_size]
+            ids, attention_mask = pad_batch([input_ids[i] for i in batch_rows], pad_token_id)
+            attention_mask = torch.from_numpy(attention_mask)
+            started = time.perf_counter()
+            outputs = runner(input_ids=torch.from_numpy(ids), attention_mask=attention_mask)
+            forward_done = time.perf_counter()
+
+            pooled = pool(outputs.last_hidden_state, attention_mask).float()
+            if projection is not None:
+                pooled = pooled @ projection
+            embeddings[batch_rows] = pooled.numpy()
+            if timings is not None:
+                timings['forward'] += forward_done - started
+                timings['postprocess'] += time.perf_counter() - forward_done
+
+    return embeddings
+
+
+def embed_lines(lines, batch_size=DEFAULT_BATCH_SIZE, cache=None, templates=False):
+    """Embed a list of text lines, returning a (len(lines), embedding_size()) matrix.
+
+    With an EmbeddingCache only lines it has not seen before reach the model.
+    With templates=True timestamps, ids and addresses are masked first and every
+    unique template is embedded once, then copied to each line that produced it.
+    """
+    if templates:
+        unique_templates, _, inverse = group_templates(lines)
+        return embed_lines(unique_templates, batch_size=batch_size, cache=cache)[inverse]
+
+    if cache is None:
+        return embed_encoded(tokenize_lines(lines), batch_size=batch_size)
+
+    lines = list(lines)
+    embeddings = np.zeros((len(lines), embedding_size()), dtype=embedding_dtype())
+    missing = {}
+    for row, vector in enumerate(cache.get_many(lines)):
+        if vector is None:
+            missing.setdefault(normalize_line(lines[row]), []).append(row)
+        else:
+            embeddings[row] = vector
+
+    if missing:
+        new_lines = [lines[rows[0]] for rows in missing.values()]
+        computed = embed_encoded(tokenize_lines(new_lines), batch_size=batch_size)
+        cache.put_many(new_lines, computed)
+        for vector, rows in zip(computed, missing.values()):
+            embeddings[rows] = vector
+
+    return embeddings
+
 
 # Function to generate word embeddings
-def generate_word_embeddings(text_file_path):
+def generate_word_embeddings(text_file_path, batch_size=DEFAULT_BATCH_SIZE, cache=None, templates=False):
     # Read the content of the text file
     with open(text_file_path, 'r', encoding='utf-8') as file:
         lines = file.readlines()
 
-    # Initialize an empty list to store the embeddings
-    embeddings = []
+    return embed_lines(lines, batch_size=batch_size, cache=cache, templates=templates)
 
-    # Process each line in the text file
-    for line in lines:
-        # Tokenize the text
-        tokens = tokenizer(line, padding=True, truncation=True, return_tensors='pt')
-        
-        # Get the model's output
-        with torch.no_grad():
-            outputs = model(**tokens)
-            embeddings.append(outputs.last_hidden_state.mean(dim=1).numpy())
 
-    # Convert the list of embeddings to a numpy array
-    embeddings = np.vstack(embeddings)
+def count_lines(text_file_path):
+    """Count '\\n'-terminated lines (plus a trailing unterminated one) without decoding the file"""
+    count = 0
+    last_byte = b'\n'
+    with open(text_file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            count += block.count(b'\n')
+            last_byte = block[-1:]
+    if last_byte != b'\n':
+        count += 1
+    return count
 
+
+def _progress_path(output_file_path):
+    return output_file_path + '.progress'
+
+
+def _read_progress(progress_path):
+    try:
+        with open(progress_path, 'r') as file:
+            return int(file.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_progress(progress_path, rows_done):
+    # Write then rename so a crash never leaves a half-written checkpoint
+    tmp_path = progress_path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        file.write(str(rows_done))
+    os.replace(tmp_path, progress_path)
+
+
+def stream_word_embeddings(text_file_path, output_file_path, batch_size=DEFAULT_BATCH_SIZE,
+                           chunk_lines=DEFAULT_CHUNK_LINES, resume=True, cache=None, templates=False):
+    """Embed a file chunk by chunk straight into a preallocated .npy memmap.
+
+    Only one chunk of text is held in memory at a time. After every chunk the
+    number of finished rows is checkpointed next to the output, so a rerun with
+    resume=True continues from the last completed row. Lines are split on '\\n'.
+    """
+    total_lines = count_lines(text_file_path)
+    shape = (total_lines, embedding_size())
+    progress_path = _progress_path(output_file_path)
+    if total_lines == 0:
+        # np.memmap cannot map an empty data section
+        embeddings = np.zeros(shape, dtype=embedding_dtype())
+        np.save(output_file_path, embeddings)
+        save_embedding_settings(output_file_path)
+        return embeddings
+
+    rows_done = _read_progress(progress_path) if resume and os.path.exists(output_file_path) else None
+    embeddings = None
+    if rows_done is not None:
+        embeddings = np.load(output_file_path, mmap_mode='r+')
+        saved_settings = load_embedding_settings(output_file_path) or {}
+        if (embeddings.shape != shape or embeddings.dtype != embedding_dtype() or rows_done > total_lines
+                or any(saved_settings.get(key) != value for key, value in embedding_settings().items())):
+            # Input, model or pooling changed since the checkpoint, start over
+            del embeddings
+            embeddings = None
+    if embeddings is None:
+        rows_done = 0
+        embeddings = np.lib.format.open_memmap(output_file_path, mode='w+', dtype=embedding_dtype(), shape=shape)
+        save_embedding_settings(output_file_path)
+        _write_progress(progress_path, rows_done)
+
+    with open(text_file_path, 'r', encoding='utf-8', newline='\n') as file:
+        remaining = itertools.islice(file, rows_done, None)
+        while True:
+            chunk = list(itertools.islice(remaining, chunk_lines))
+            if not chunk:
+                break
+            embeddings[rows_done:rows_done + len(chunk)] = embed_lines(
+                chunk, batch_size=batch_size, cache=cache, templates=templates)
+            rows_done += len(chunk)
+            embeddings.flush()
+            _write_progress(progress_path, rows_done)
+
+    os.remove(progress_path)
     return embeddings
 
-# Example usage
-text_file_path = 'C:\\Users\\ganes\\Downloads\\log\\Android_2k.log'
-output_file_path = 'C:\\Users\\ganes\\Downloads\\log\\Android_2k.npy'
-embeddings = generate_word_embeddings(text_file_path)
-np.save(output_file_path, embeddings)
 
-# Now, 'embeddings' contains the word embeddings for the content in the text file
-print(embeddings.shape)  # Print the shape of the embeddings matrix
+def embed_token_shards(shard_dir, output_file_path, batch_size=DEFAULT_BATCH_SIZE,
+                       chunk_lines=DEFAULT_CHUNK_LINES):
+    """Embed a corpus written by token_shards.py without tokenizing it again.
 
-A bank analyst tasked with reviewing financial documents submitted by clients typically follows a structured process to assess the client's financial health and creditworthiness. Here are the steps involved:
+    The shards are memory-mapped and the output is written chunk by chunk into a
+    preallocated .npy, like stream_word_embeddings. The shards must have been
+    written with this model's tokenizer, other token ids would embed as garbage.
+    """
+    corpus = TokenShards(shard_dir)
+    if corpus.meta['tokenizer'] != model_name:
+        raise ValueError(f"{shard_dir} was tokenized with {corpus.meta['tokenizer']}, not {model_name}")
+    shape = (len(corpus), embedding_size())
+    save_embedding_settings(output_file_path)
+    if len(corpus) == 0:
+        embeddings = np.zeros(shape, dtype=embedding_dtype())
+        np.save(output_file_path, embeddings)
+        return embeddings
+    embeddings = np.lib.format.open_memmap(output_file_path, mode='w+', dtype=embedding_dtype(), shape=shape)
+    for start in range(0, len(corpus), chunk_lines):
+        chunk = [corpus[row] for row in range(start, min(start + chunk_lines, len(corpus)))]
+        embeddings[start:start + len(chunk)] = embed_encoded(chunk, batch_size=batch_size)
+        embeddings.flush()
+    return embeddings
 
-1. **Document Collection**:
-   - Gather all the financial documents submitted by the client. This may include financial statements, tax returns, bank statements, and any other relevant financial records.
 
-2. **Preliminary Review**:
-   - Conduct an initial scan of the documents to ensure that they are complete and all necessary information is included. If any documents are missing or incomplete, request the client to provide the required information.
+def embed_new_log_lines(log_dir, state_path, output_file_path, batch_size=DEFAULT_BATCH_SIZE, cache=None,
+                        templates=False):
+    """Embed only the log lines appended since the last run recorded in state_path.
 
-3. **Verification of Authenticity**:
-   - Verify the authenticity of the submitted documents. This may involve cross-referencing with external sources, contacting relevant authorities, or using fraud detection tools to ensure the documents are legitimate.
+    The delta matrix is saved to output_file_path and the (file, line) of every
+    row to output_file_path + '.sources.jsonl'; offsets are committed afterwards.
+    """
+    indexer = IncrementalLogIndexer(state_path)
+    lines = []
+    sources = []
+    for file_path, line_number, line in indexer.iter_new_log_lines(log_dir):
+        lines.append(line)
+        sources.append({'file': file_path, 'line': line_number})
 
-4. **Financial Statement Analysis**:
-   - Analyze the client's financial statements, including the income statement, balance sheet, and cash flow statement. Evaluate key financial metrics such as revenue, expenses, profit margins, liquidity ratios, and leverage ratios.
+    if lines:
+        embeddings = embed_lines(lines, batch_size=batch_size, cache=cache, templates=templates)
+    else:
+        embeddings = np.zeros((0, embedding_size()), dtype=embedding_dtype())
+    np.save(output_file_path, embeddings)
+    save_embedding_settings(output_file_path)
+    with open(output_file_path + '.sources.jsonl', 'w', encoding='utf-8') as file:
+        for source in sources:
+            file.write(json.dumps(source) + '\n')
+    indexer.commit()
+    return embeddings
 
-5. **Credit History Check**:
-   - Review the client's credit history, including credit scores, credit reports, and any outstanding loans or credit obligations. Assess the client's track record in repaying debts.
 
-6. **Risk Assessment**:
-   - Evaluate the overall financial health of the client. Assess the client's ability to meet current and future financial obligations. Identify potential risks associated with the client's financial situation.
+def _shard_file(text_file_path, workers):
+    """Split a file into up to `workers` byte ranges that start on line boundaries.
 
-7. **Industry and Market Analysis**:
-   - If applicable, analyze the client's industry and market conditions. Consider how economic factors, market trends, and industry-specific risks may impact the client's financial stability.
+    Returns (start, end, first_row) per shard, where first_row is the output row
+    of the shard's first line.
+    """
+    size = os.path.getsize(text_file_path)
+    starts = [0]
+    with open(text_file_path, 'rb') as file:
+        for shard in range(1, workers):
+            target = size * shard // workers
+            if target <= starts[-1]:
+                continue
+            # Back up one byte so a target that already sits on a line start is kept
+            file.seek(target - 1)
+            file.readline()
+            if starts[-1] < file.tell() < size:
+                starts.append(file.tell())
 
-8. **Collateral Assessment**:
-   - If the client is seeking a secured loan, assess the value and quality of the proposed collateral. Determine whether the collateral adequately secures the loan.
+        shards = []
+        first_row = 0
+        for start, end in zip(starts, starts[1:] + [size]):
+            shards.append((start, end, first_row))
+            file.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                block = file.read(min(1 << 20, remaining))
+                first_row += block.count(b'\n')
+                remaining -= len(block)
+    return shards
 
-9. **Cash Flow Analysis**:
-   - Evaluate the client's cash flow projections. Determine whether the client has sufficient cash flow to meet loan repayment obligations and other financial commitments.
 
-10. **Debt Service Coverage Ratio (DSCR)**:
-    - Calculate the Debt Service Coverage Ratio, which measures the client's ability to cover debt payments from operating cash flow. A DSCR above 1 indicates the ability to meet debt obligations.
+def _embed_shard(text_file_path, output_file_path, start, end, first_row, cores, batch_size, chunk_lines,
+                 cache_path, cache_max_bytes, templates, settings):
+    """Worker entry point: embed one byte range into its rows of the shared output"""
+    apply_embedding_settings(settings)
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    # One intra-op thread per pinned core, workers must not oversubscribe the node
+    torch.set_num_threads(len(cores))
 
-11. **Recommendation**:
-    - Based on the analysis, make a recommendation to approve, deny, or conditionally approve the client's request for a loan or financial service. Provide a rationale for the recommendation.
+    cache = EmbeddingCache(cache_path, cache_namespace(), max_bytes=cache_max_bytes) if cache_path else None
+    output = np.load(output_file_path, mmap_mode='r+')
+    row = first_row
+    with open(text_file_path, 'rb') as file:
+        file.seek(start)
+        position = start
+        chunk = []
+        while position < end:
+            line = file.readline()
+            if not line:
+                break
+            position += len(line)
+            chunk.append(line.decode('utf-8'))
+            if len(chunk) == chunk_lines or position >= end:
+                output[row:row + len(chunk)] = embed_lines(chunk, batch_size=batch_size, cache=cache,
+                                                           templates=templates)
+                row += len(chunk)
+                chunk = []
+    output.flush()
+    if cache is not None:
+        cache.close()
+    return row - first_row
 
-12. **Documentation and Reporting**:
-    - Prepare a comprehensive report summarizing the analysis and recommendation. Include all relevant financial data, risk assessments, and supporting documentation.
 
-13. **Presentation and Decision**:
-    - Present the analysis and recommendation to the bank's credit committee or decision-making authority. Participate in discussions and provide clarifications as needed.
+def parallel_word_embeddings(text_file_path, output_file_path, workers, batch_size=DEFAULT_BATCH_SIZE,
+                             chunk_lines=DEFAULT_CHUNK_LINES, cache_path=None, cache_max_bytes=DEFAULT_MAX_BYTES,
+                             templates=False):
+    """Embed a file with `workers` processes writing into one shared .npy memmap.
 
-14. **Follow-up and Communication**:
-    - Communicate the decision to the client, including any conditions or requirements for approval. Address any questions or concerns raised by the client.
+    The file is sharded by byte ranges on line boundaries and every worker is pinned
+    to its own slice of the available cores. Each worker loads its own model copy.
+    Lines are split on '\\n' as in stream_word_embeddings; there is no resume.
+    """
+    total_lines = count_lines(text_file_path)
+    shape = (total_lines, embedding_size())
+    save_embedding_settings(output_file_path)
+    if total_lines == 0:
+        embeddings = np.zeros(shape, dtype=embedding_dtype())
+        np.save(output_file_path, embeddings)
+        return embeddings
+    output = np.lib.format.open_memmap(output_file_path, mode='w+', dtype=embedding_dtype(), shape=shape)
+    del output
 
-15. **Monitoring**:
-    - If the loan or financial service is approved, establish a monitoring plan to track the client's financial performance throughout the relationship. Regularly review financial updates and compliance with loan covenants.
+    shards = _shard_file(text_file_path, workers)
+    if hasattr(os, 'sched_getaffinity'):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    core_groups = [group.tolist() or cores for group in np.array_split(cores, len(shards))]
 
-16. **Documentation and Record-Keeping**:
-    - Maintain accurate records of the client's financial information, analysis, and decision-making processes for compliance and auditing purposes.
+    # spawn: forking a process that already holds torch thread pools can deadlock
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(len(shards)) as pool:
+        jobs = [(text_file_path, output_file_path, start, end, first_row, group, batch_size, chunk_lines,
+                 cache_path, cache_max_bytes, templates, embedding_settings())
+                for (start, end, first_row), group in zip(shards, core_groups)]
+        pool.starmap(_embed_shard, jobs)
+
+    return np.load(output_file_path, mmap_mode='r')
+
+
+# Example usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate BERT embeddings for every line of a text file")
+    parser.add_argument('input', nargs='?', default='C:\\Users\\ganes\\Downloads\\log\\Android_2k.log')
+    parser.add_argument('output', nargs='?', default='C:\\Users\\ganes\\Downloads\\log\\Android_2k.npy')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--stream', action='store_true',
+                        help="write chunks straight into a memory-mapped .npy and resume after a crash")
+    parser.add_argument('--chunk-lines', type=int, default=DEFAULT_CHUNK_LINES)
+    parser.add_argument('--cache', help="SQLite file used to reuse embeddings of previously seen lines")
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_BYTES >> 20)
+    parser.add_argument('--templates', action='store_true',
+                        help="mask timestamps, ids and addresses and embed each log template once")
+    parser.add_argument('--token-shards', action='store_true',
+                        help="input is a directory written by token_shards.py instead of a text file")
+    parser.add_argument('--incremental', metavar='STATE',
+                        help="input is a log directory; only embed lines appended since the last run")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="shard the file across N processes writing into one memory-mapped .npy")
+    parser.add_argument('--backend', choices=inference_backends.BACKENDS, default=backend_name,
+                        help="eager PyTorch, dynamic int8 quantized PyTorch, or ONNX Runtime")
+    parser.add_argument('--pooling', choices=POOLINGS, default=pooling)
+    parser.add_argument('--layers', type=int, help="run only the first N encoder layers")
+    parser.add_argument('--projection-dim', type=int,
+                        help="randomly project the pooled vectors to this many float16 dimensions")
+    parser.add_argument('--prewarm', action='store_true',
+                        help="start loading the model in the background while the input is scanned")
+    args = parser.parse_args()
 
-This structured review process helps bank analysts make informed decisions regarding loan approvals and other financial services while ensuring compliance with regulatory requirements and risk management practices.
+    backend_name = args.backend
+    pooling = args.pooling
+    num_layers = args.layers
+    projection_dim = args.projection_dim
+    if args.prewarm and args.workers <= 1:
+        model_registry.prewarm((model_registry.TOKENIZER, model_name), (model_registry.EMBEDDING, model_name))
+    # Worker processes open their own connection to the cache file
+    cache = None
+    if args.cache and args.workers <= 1:
+        cache = EmbeddingCache(args.cache, cache_namespace(), max_bytes=args.cache_max_mb << 20)
+    if args.incremental:
+        embeddings = embed_new_log_lines(args.input, args.incremental, args.output, batch_size=args.batch_size,
+                                         cache=cache, templates=args.templates)
+    elif args.token_shards:
+        embeddings = embed_token_shards(args.input, args.output, batch_size=args.batch_size,
+                                        chunk_lines=args.chunk_lines)
+    elif args.workers > 1:
+        embeddings = parallel_word_embeddings(args.input, args.output, args.workers, batch_size=args.batch_size,
+                                              chunk_lines=args.chunk_lines, cache_path=args.cache,
+                                              cache_max_bytes=args.cache_max_mb << 20, templates=args.templates)
+    elif args.stream:
+        embeddings = stream_word_embeddings(args.input, args.output, batch_size=args.batch_size,
+                                            chunk_lines=args.chunk_lines, cache=cache, templates=args.templates)
+    else:
+        embeddings = generate_word_embeddings(args.input, batch_size=args.batch_size, cache=cache,
+                                              templates=args.templates)
+        np.save(args.output, embeddings)
+        save_embedding_settings(args.output)
+    if cache is not None:
+        print(cache.stats())
+        cache.close()
 
+    # Now, 'embeddings' contains the word embeddings for the content in the text file
+    print(embeddings.shape)  # Print the shape of the embeddings matrix
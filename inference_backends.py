@@ -0,0 +1,275 @@
+import argparse
+import copy
+import io
+import os
+import re
+import time
+from types import SimpleNamespace
+import torch
+import model_registry
+
+# Available backends
+EAGER = 'eager'
+INT8 = 'int8'
+ONNX = 'onnx'
+BACKENDS = (EAGER, INT8, ONNX)
+
+# Output names per model kind, in the order the models return them
+_OUTPUT_NAMES = {
+    model_registry.EMBEDDING: ('last_hidden_state',),
+    model_registry.QUESTION_ANSWERING: ('start_logits', 'end_logits'),
+}
+_INPUT_NAMES = ('input_ids', 'attention_mask', 'token_type_ids')
+
+# Exported ONNX graphs are kept here between runs
+ONNX_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'log_models', 'onnx')
+
+
+class TorchBackend:
+    """Runs a PyTorch model; outputs are exposed as attributes like a transformers ModelOutput"""
+
+    def __init__(self, model, kind):
+        self.model = model
+        self.kind = kind
+        self.config = model.config
+
+    def __call__(self, input_ids, attention_mask, token_type_ids=None):
+        with torch.inference_mode():
+            outputs = self.model(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids)
+        return SimpleNamespace(**{name: getattr(outputs, name) for name in _OUTPUT_NAMES[self.kind]})
+
+    def size_bytes(self):
+        # Serialized size, which also counts the packed int8 weights of quantized layers
+        buffer = io.BytesIO()
+        torch.save(self.model.state_dict(), buffer)
+        return buffer.tell()
+
+
+class OnnxBackend:
+    """Runs an exported ONNX graph with onnxruntime on the CPU"""
+
+    def __init__(self, onnx_path, config, kind):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.onnx_path = onnx_path
+        self.config = config
+        self.kind = kind
+
+    def __call__(self, input_ids, attention_mask, token_type_ids=None):
+        if token_type_ids is None:
+            token_type_ids = torch.zeros_like(input_ids)
+        feed = {'input_ids': input_ids.numpy(), 'attention_mask': attention_mask.numpy(),
+                'token_type_ids': token_type_ids.numpy()}
+        outputs = self.session.run(list(_OUTPUT_NAMES[self.kind]), feed)
+        return SimpleNamespace(**{name: torch.from_numpy(value)
+                                  for name, value in zip(_OUTPUT_NAMES[self.kind], outputs)})
+
+    def size_bytes(self):
+        return os.path.getsize(self.onnx_path)
+
+
+def _onnx_path(kind, model_name, num_layers=None):
+    safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+    suffix = f'-{num_layers}layers' if num_layers else ''
+    return os.path.join(ONNX_CACHE_DIR, f'{safe_name}-{kind}{suffix}.onnx')
+
+
+def truncate_layers(model, num_layers):
+    """View of a BERT encoder model that stops after its first num_layers layers.
+
+    Shares the weights with the full model; the remaining layers are never run,
+    so their compute is skipped rather than computed and discarded.
+    """
+    if not 0 < num_layers <= len(model.encoder.layer):
+        raise ValueError(f"num_layers must be between 1 and {len(model.encoder.layer)}, got {num_layers}")
+    # Copy the module dicts too, assigning a submodule must not change the shared full model
+    encoder = copy.copy(model.encoder)
+    encoder._modules = dict(model.encoder._modules)
+    encoder.layer = torch.nn.ModuleList(list(model.encoder.layer)[:num_layers])
+    truncated = copy.copy(model)
+    truncated._modules = dict(model._modules)
+    truncated.encoder = encoder
+    truncated.config = copy.copy(model.config)
+    truncated.config.num_hidden_layers = num_layers
+    return truncated
+
+
+class _ExportWrapper(torch.nn.Module):
+    """Calls the model with keyword inputs and returns plain output tensors, for tracing"""
+
+    def __init__(self, model, kind):
+        super().__init__()
+        self.model = model
+        self.output_names = _OUTPUT_NAMES[kind]
+
+    def forward(self, input_ids, attention_mask, token_type_ids):
+        outputs = self.model(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids)
+        return tuple(getattr(outputs, name) for name in self.output_names)
+
+
+def export_onnx(model, kind, onnx_path):
+    """Export a BERT model with dynamic batch and sequence axes"""
+    os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+    sample = torch.ones((2, 8), dtype=torch.long)
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in _INPUT_NAMES + _OUTPUT_NAMES[kind]}
+    tmp_path = onnx_path + '.tmp'
+    # The exporter restores the wrapper's mode afterwards, which would flip the shared model to training
+    wrapper = _ExportWrapper(model, kind).eval()
+    with torch.inference_mode():
+        torch.onnx.export(wrapper, (sample, sample, torch.zeros_like(sample)), tmp_path,
+                          input_names=list(_INPUT_NAMES), output_names=list(_OUTPUT_NAMES[kind]),
+                          dynamic_axes=dynamic_axes, opset_version=17, dynamo=False)
+    os.replace(tmp_path, onnx_path)
+    return onnx_path
+
+
+def _build(backend, kind, model_name, num_layers=None):
+    model = model_registry.get(kind, model_name)
+    if num_layers:
+        if kind != model_registry.EMBEDDING:
+            raise ValueError("Only embedding models can stop at an intermediate layer")
+        model = truncate_layers(model, num_layers)
+    if backend == EAGER:
+        return TorchBackend(model, kind)
+    if backend == INT8:
+        # Dynamic quantization: Linear weights stored as int8, activations quantized per batch
+        quantized = torch.ao.quantization.quantize_dynamic(copy.deepcopy(model), {torch.nn.Linear},
+                                                           dtype=torch.qint8)
+        return TorchBackend(quantized, kind)
+    if backend == ONNX:
+        onnx_path = _onnx_path(kind, model_name, num_layers)
+        if not os.path.exists(onnx_path):
+            export_onnx(model, kind, onnx_path)
+        return OnnxBackend(onnx_path, model.config, kind)
+    raise ValueError(f"Unknown backend: {backend}, expected one of {', '.join(BACKENDS)}")
+
+
+def get_backend(backend, kind, model_name, num_layers=None):
+    """Return the cached backend for a model, building (quantizing or exporting) it on first use.
+
+    With num_layers an embedding model only runs its first num_layers encoder layers.
+    """
+    return model_registry.cached(('backend', backend, kind, model_name, num_layers),
+                                 lambda: _build(backend, kind, model_name, num_layers))
+
+
+def check_parity(backend, kind, model_name, tokenizer_name, texts, questions=None):
+    """Compare a backend against eager PyTorch on the same inputs.
+
+    For embedding models reports the max absolute difference and the minimum
+    cosine similarity of the mean-pooled rows. For QA models reports the max
+    logit difference and the share of (question, text) pairs whose best span
+    is unchanged.
+    """
+    tokenizer = model_registry.get_tokenizer(tokenizer_name)
+    if kind == model_registry.QUESTION_ANSWERING:
+        questions = questions or ["What happened?"] * len(texts)
+        encoded = tokenizer(questions, texts, padding=True, truncation=True, return_tensors='pt')
+    else:
+        encoded = tokenizer(texts, padding=True, truncation=True, return_tensors='pt')
+    inputs = {name: encoded[name] for name in _INPUT_NAMES if name in encoded}
+    reference = get_backend(EAGER, kind, model_name)(**inputs)
+    candidate = get_backend(backend, kind, model_name)(**inputs)
+
+    if kind == model_registry.QUESTION_ANSWERING:
+        max_diff = max(float((getattr(reference, name) - getattr(candidate, name)).abs().max())
+                       for name in _OUTPUT_NAMES[kind])
+        same_start = reference.start_logits.argmax(dim=1) == candidate.start_logits.argmax(dim=1)
+        same_end = reference.end_logits.argmax(dim=1) == candidate.end_logits.argmax(dim=1)
+        return {'backend': backend, 'max_abs_diff': max_diff,
+                'span_agreement': float((same_start & same_end).float().mean())}
+
+    mask = inputs['attention_mask'].unsqueeze(-1).float()
+    pooled_reference = (reference.last_hidden_state * mask).sum(1) / mask.sum(1)
+    pooled_candidate = (candidate.last_hidden_state * mask).sum(1) / mask.sum(1)
+    cosine = torch.nn.functional.cosine_similarity(pooled_reference, pooled_candidate, dim=1)
+    return {'backend': backend, 'max_abs_diff': float((pooled_reference - pooled_candidate).abs().max()),
+            'min_cosine': float(cosine.min())}
+
+
+def _rss_bytes():
+    # Current resident set size; falls back to the peak where /proc is missing, None where neither
+    # the Unix-only resource module nor psutil is available (Windows without psutil)
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (FileNotFoundError, ValueError, OSError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        return None
+
+
+def benchmark_backends(kind, model_name, tokenizer_name, texts, backends=BACKENDS, batch_size=16, repeats=3):
+    """Latency per batch, model size and resident memory added by each backend"""
+    tokenizer = model_registry.get_tokenizer(tokenizer_name)
+    batches = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        if kind == model_registry.QUESTION_ANSWERING:
+            encoded = tokenizer(["What happened?"] * len(batch), batch, padding=True, truncation=True,
+                                return_tensors='pt')
+        else:
+            encoded = tokenizer(batch, padding=True, truncation=True, return_tensors='pt')
+        batches.append({name: encoded[name] for name in _INPUT_NAMES if name in encoded})
+
+    model_registry.get(kind, model_name)
+    results = []
+    for backend in backends:
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        runner = get_backend(backend, kind, model_name)
+        load_seconds = time.perf_counter() - start
+        rss_after = _rss_bytes()
+        rss_added = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        runner(**batches[0])  # warm-up
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for inputs in batches:
+                runner(**inputs)
+        elapsed = time.perf_counter() - start
+        results.append({
+            'backend': backend,
+            'load_s': load_seconds,
+            'ms_per_batch': elapsed * 1000 / (repeats * len(batches)),
+            'lines_per_s': repeats * len(texts) / elapsed,
+            'model_mb': runner.size_bytes() / (1 << 20),
+            'rss_added_mb': rss_added / (1 << 20) if rss_added is not None else None,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parity check and benchmark of the CPU inference backends")
+    parser.add_argument('input', help="text or log file whose lines are used as inputs")
+    parser.add_argument('--kind', choices=[model_registry.EMBEDDING, model_registry.QUESTION_ANSWERING],
+                        default=model_registry.EMBEDDING)
+    parser.add_argument('--model', default='deepset/bert-large-uncased-whole-word-masking-squad2')
+    parser.add_argument('--tokenizer', default='deepset/bert-large-uncased-whole-word-masking-squad2')
+    parser.add_argument('--lines', type=int, default=256)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    args = parser.parse_args()
+
+    with open(args.input, 'r', encoding='utf-8', errors='replace') as file:
+        texts = [line.strip() for _, line in zip(range(args.lines), file) if line.strip()]
+
+    print(f"{'backend':<8} {'load s':>8} {'ms/batch':>10} {'lines/s':>10} {'model MB':>10} {'RSS +MB':>10}  parity")
+    for result in benchmark_backends(args.kind, args.model, args.tokenizer, texts, backends=args.backends,
+                                     batch_size=args.batch_size):
+        parity = check_parity(result['backend'], args.kind, args.model, args.tokenizer, texts[:args.batch_size])
+        parity_text = ', '.join(f"{key}={value:.4f}" for key, value in parity.items() if key != 'backend')
+        rss_text = f"{result['rss_added_mb']:.1f}" if result['rss_added_mb'] is not None else '-'
+        print(f"{result['backend']:<8} {result['load_s']:>8.2f} {result['ms_per_batch']:>10.1f} "
+              f"{result['lines_per_s']:>10.1f} {result['model_mb']:>10.1f} {rss_text:>10}  "
+              f"{parity_text}")
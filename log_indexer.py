@@ -0,0 +1,88 @@
+import json
+import os
+import re
+
+# Bytes read per call while scanning the new part of a file
+READ_BLOCK_BYTES = 1 << 20
+
+# app.log and its uncompressed rotations app.log.1, app.log.2, ...; compressed rotations
+# are new files with new inodes, so offsets could never be carried over to them
+_PLAIN_LOG_NAME = re.compile(r'\.log(?:\.\d+)?$')
+
+
+def list_log_files(log_dir):
+    """Paths of the .log files and their uncompressed rotations in log_dir, in a stable order"""
+    return [os.path.join(log_dir, filename) for filename in sorted(os.listdir(log_dir))
+            if _PLAIN_LOG_NAME.search(filename) and os.path.isfile(os.path.join(log_dir, filename))]
+
+
+class IncrementalLogIndexer:
+    """Remembers how far every log file has been processed so reruns only see new lines.
+
+    The state file maps each path to its inode, size, byte offset and line count.
+    A file whose inode changed was rotated and is read from the start; if its old
+    inode shows up under another name (app.log -> app.log.1) the unread tail of
+    that file is picked up there. A file smaller than its recorded size was
+    truncated, or is a new file that reused a freed inode, and is read from the
+    start. Offsets only ever stop after a complete line, and they
+    are only saved by commit(), so a crashed run is simply redone.
+    """
+
+    def __init__(self, state_path):
+        self.state_path = state_path
+        self.state = {}
+        if os.path.exists(state_path):
+            with open(state_path, 'r') as file:
+                self.state = json.load(file)
+        self.pending = {}
+
+    def _resume_point(self, path, stat, previous_by_inode):
+        previous = self.state.get(path)
+        if previous is None or previous['inode'] != stat.st_ino:
+            # New name or rotated: continue a known inode where it stopped, else start over
+            previous = previous_by_inode.get(stat.st_ino)
+        # Logs only grow: a smaller file under a known inode is truncated or a different file
+        if previous is None or previous['inode'] != stat.st_ino or stat.st_size < previous['size']:
+            return 0, 0
+        return previous['offset'], previous['lines']
+
+    def iter_new_lines(self, paths):
+        """Yield (path, line_number, line) for every complete line added since the last commit"""
+        previous_by_inode = {entry['inode']: entry for entry in self.state.values()}
+        for path in paths:
+            stat = os.stat(path)
+            offset, line_number = self._resume_point(path, stat, previous_by_inode)
+            with open(path, 'rb') as file:
+                file.seek(offset)
+                remaining = stat.st_size - offset
+                partial = b''
+                while remaining > 0:
+                    block = file.read(min(READ_BLOCK_BYTES, remaining))
+                    if not block:
+                        break
+                    remaining -= len(block)
+                    lines = (partial + block).split(b'\n')
+                    # The last piece has no newline yet, keep it for the next block or run
+                    partial = lines.pop()
+                    for line in lines:
+                        offset += len(line) + 1
+                        line_number += 1
+                        yield path, line_number, line.decode('utf-8', errors='replace').rstrip('\r')
+            self.pending[path] = {'inode': stat.st_ino, 'size': stat.st_size, 'offset': offset,
+                                  'lines': line_number}
+
+    def iter_new_log_lines(self, log_dir):
+        return self.iter_new_lines(list_log_files(log_dir))
+
+    def commit(self):
+        """Persist the offsets reached by the consumed iterators"""
+        self.state.update(self.pending)
+        # Forget files that were deleted or whose inode is now tracked under another name
+        live_inodes = {entry['inode'] for entry in self.pending.values()}
+        self.state = {path: entry for path, entry in self.state.items()
+                      if os.path.exists(path) and (path in self.pending or entry['inode'] not in live_inodes)}
+        self.pending = {}
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(self.state, file, indent=1)
+        os.replace(tmp_path, self.state_path)
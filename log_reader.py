@@ -0,0 +1,149 @@
+import argparse
+import bz2
+import gzip
+import io
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Default decoding: log files are mostly UTF-8, and a stray byte must not abort a run
+DEFAULT_ENCODING = 'utf-8'
+DEFAULT_ERRORS = 'replace'
+
+# Size of the buffered reads under the text decoder, and lines handed over per queue item
+READ_BUFFER_BYTES = 1 << 20
+CHUNK_LINES = 4096
+
+# Files read at once, and chunks a file may have waiting before its reader blocks
+DEFAULT_READ_WORKERS = 4
+QUEUE_CHUNKS = 8
+
+# app.log, app.log.1, app.log.2.gz, app.log.3.zst, ...
+_LOG_NAME = re.compile(r'\.log(?:\.\d+)?(?:\.(?:gz|bz2|zst))?$')
+
+
+def is_log_file(filename):
+    return _LOG_NAME.search(filename) is not None
+
+
+def find_log_files(log_dir):
+    """Paths of the plain and rotated/compressed log files in log_dir, in a stable order"""
+    return [os.path.join(log_dir, filename) for filename in sorted(os.listdir(log_dir))
+            if is_log_file(filename) and os.path.isfile(os.path.join(log_dir, filename))]
+
+
+def _open_binary(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    if path.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(f"Reading {path} needs the zstandard package (pip install zstandard)") from None
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True,
+                                                             closefd=True)
+    return open(path, 'rb', buffering=0)
+
+
+def open_log(path, encoding=DEFAULT_ENCODING, errors=DEFAULT_ERRORS):
+    """Open a plain, .gz, .bz2 or .zst log file as text with large buffered reads"""
+    raw = _open_binary(path)
+    return io.TextIOWrapper(io.BufferedReader(raw, buffer_size=READ_BUFFER_BYTES), encoding=encoding,
+                            errors=errors)
+
+
+def iter_log_lines(path, encoding=DEFAULT_ENCODING, errors=DEFAULT_ERRORS):
+    """Yield (line_number, line) lazily, without the line ending"""
+    with open_log(path, encoding=encoding, errors=errors) as file:
+        for line_number, line in enumerate(file, start=1):
+            yield line_number, line.rstrip('\n')
+
+
+def _read_into(path, chunks, stop, encoding, errors):
+    # Runs in a pool thread: decompression and file reads release the GIL
+    try:
+        chunk = []
+        for line_number, line in iter_log_lines(path, encoding=encoding, errors=errors):
+            if not chunk:
+                first_line = line_number
+            chunk.append(line)
+            if len(chunk) == CHUNK_LINES:
+                if not _put(chunks, (first_line, chunk), stop):
+                    return
+                chunk = []
+        if chunk:
+            _put(chunks, (first_line, chunk), stop)
+    except BaseException as error:
+        _put(chunks, error, stop)
+    finally:
+        _put(chunks, None, stop)
+
+
+def _put(chunks, item, stop):
+    # Block while the consumer is behind, but give up once it has gone away
+    while not stop.is_set():
+        try:
+            chunks.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def read_log_files(paths, workers=DEFAULT_READ_WORKERS, encoding=DEFAULT_ENCODING, errors=DEFAULT_ERRORS):
+    """Yield (path, line_number, line) for every line of paths, file by file in order.
+
+    Up to `workers` files are read and decoded concurrently. Each file has a
+    bounded queue of line chunks, so readers that get ahead of the consumer wait
+    instead of holding whole files in memory. Files are started in order, so the
+    file being consumed always has a running reader.
+    """
+    paths = list(paths)
+    if not paths:
+        return
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=QUEUE_CHUNKS) for _ in paths]
+    pool = ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths))), thread_name_prefix='log-reader')
+    try:
+        for path, chunks in zip(paths, queues):
+            pool.submit(_read_into, path, chunks, stop, encoding, errors)
+        for path, chunks in zip(paths, queues):
+            while True:
+                item = chunks.get()
+                if item is None:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                first_line, lines = item
+                for offset, line in enumerate(lines):
+                    yield path, first_line + offset, line
+    finally:
+        # Also reached when the consumer stops early: unblock and retire the readers
+        stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read a directory of (compressed) log files and report throughput")
+    parser.add_argument('log_dir')
+    parser.add_argument('--workers', type=int, default=DEFAULT_READ_WORKERS)
+    parser.add_argument('--encoding', default=DEFAULT_ENCODING)
+    parser.add_argument('--errors', default=DEFAULT_ERRORS,
+                        help="decoding error policy: strict, replace, ignore, backslashreplace, surrogateescape")
+    args = parser.parse_args()
+
+    paths = find_log_files(args.log_dir)
+    start = time.perf_counter()
+    lines = 0
+    characters = 0
+    for _, _, line in read_log_files(paths, workers=args.workers, encoding=args.encoding, errors=args.errors):
+        lines += 1
+        characters += len(line)
+    elapsed = time.perf_counter() - start
+    print(f"{len(paths)} files, {lines} lines, {characters} characters in {elapsed:.2f}s "
+          f"({lines / max(elapsed, 1e-9):.0f} lines/s)")
@@ -0,0 +1,102 @@
+import math
+import pickle
+import re
+from collections import Counter, defaultdict
+import numpy as np
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+# Lines per retrievable document; windows give the reader some surrounding context
+DEFAULT_WINDOW_LINES = 1
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 over an inverted index of log lines or line windows.
+
+    Each term keeps a posting array of (document, term frequency), so a query only
+    touches the postings of its own terms, not every document in the corpus.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.texts = []
+        self.sources = []
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self.postings = {}
+        # What the index was built from (see splunk.log_index_origin), None if unknown
+        self.origin = None
+
+    @classmethod
+    def build(cls, lines, sources, window=DEFAULT_WINDOW_LINES, k1=1.5, b=0.75):
+        """Index lines with their (file, line number) sources.
+
+        With window > 1 consecutive lines of the same file are joined into one
+        document whose source is its first line.
+        """
+        index = cls(k1=k1, b=b)
+        postings = defaultdict(lambda: ([], []))
+        doc_lengths = []
+        start = 0
+        while start < len(lines):
+            end = start + 1
+            while end < len(lines) and end - start < window and sources[end][0] == sources[start][0]:
+                end += 1
+            text = '\n'.join(lines[start:end])
+            terms = Counter(tokenize(text))
+            doc = len(index.texts)
+            for term, frequency in terms.items():
+                docs, frequencies = postings[term]
+                docs.append(doc)
+                frequencies.append(frequency)
+            index.texts.append(text)
+            index.sources.append(sources[start])
+            doc_lengths.append(sum(terms.values()))
+            start = end
+
+        index.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        index.postings = {term: (np.asarray(docs, dtype=np.int32), np.asarray(frequencies, dtype=np.float32))
+                          for term, (docs, frequencies) in postings.items()}
+        return index
+
+    def __len__(self):
+        return len(self.texts)
+
+    def search(self, query, k=10):
+        """Return up to k hits as dicts with text, file, line and BM25 score, best first"""
+        if not len(self):
+            return []
+        average_length = float(self.doc_lengths.mean()) or 1.0
+        docs = []
+        contributions = []
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            term_docs, frequencies = self.postings[term]
+            idf = math.log(1 + (len(self) - len(term_docs) + 0.5) / (len(term_docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[term_docs] / average_length)
+            docs.append(term_docs)
+            contributions.append(idf * frequencies * (self.k1 + 1) / (frequencies + norm))
+        if not docs:
+            return []
+
+        # Sum per document over only the documents the query terms occur in
+        candidates, inverse = np.unique(np.concatenate(docs), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions))
+        top = np.argsort(-scores)[:k] if len(scores) <= k else np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{'text': self.texts[candidates[i]], 'file': self.sources[candidates[i]][0],
+                 'line': self.sources[candidates[i]][1], 'score': float(scores[i])} for i in top]
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as file:
+            return pickle.load(file)
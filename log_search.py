@@ -0,0 +1,248 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+# Rows scored per matmul so the working set stays small on multi-GB matrices
+DEFAULT_BLOCK_ROWS = 65536
+
+
+def _normalize(vectors):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _merge_top_k(best_scores, best_rows, scores, rows, k):
+    """Merge a new block of (nq, b) scores into the running (nq, k) top-k"""
+    scores = np.concatenate([best_scores, scores], axis=1)
+    rows = np.concatenate([best_rows, np.broadcast_to(rows, (scores.shape[0], len(rows)))], axis=1)
+    if scores.shape[1] > k:
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, keep, axis=1)
+        rows = np.take_along_axis(rows, keep, axis=1)
+    return scores, rows
+
+
+def _sorted_top_k(scores, rows):
+    order = np.argsort(-scores, axis=1)
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+
+def embed_query(text, embeddings_path=None):
+    """Embed free text with the model, pooling, layers and projection the lines in embeddings_path used"""
+    # Imported here so building or loading an index never loads BERT
+    import emdeddings
+    if embeddings_path is not None:
+        emdeddings.apply_saved_settings(embeddings_path)
+    return emdeddings.embed_lines([text])
+
+
+class ExactIndex:
+    """Brute-force cosine search over a memory-mapped embeddings .npy file"""
+
+    def __init__(self, embeddings_path, block_rows=DEFAULT_BLOCK_ROWS):
+        self.embeddings_path = embeddings_path
+        self.embeddings = np.load(embeddings_path, mmap_mode='r')
+        self.block_rows = block_rows
+        self.inv_norms = self._load_inverse_norms()
+
+    def _load_inverse_norms(self):
+        # Norms are computed once and kept next to the matrix, rows are scaled on the fly
+        norms_path = self.embeddings_path + '.norms.npy'
+        if os.path.exists(norms_path) and os.path.getmtime(norms_path) >= os.path.getmtime(self.embeddings_path):
+            return np.load(norms_path)
+        inv_norms = np.empty(len(self.embeddings), dtype=np.float32)
+        for start in range(0, len(self.embeddings), self.block_rows):
+            block = np.asarray(self.embeddings[start:start + self.block_rows], dtype=np.float32)
+            inv_norms[start:start + len(block)] = 1.0 / np.maximum(np.linalg.norm(block, axis=1), 1e-12)
+        np.save(norms_path, inv_norms)
+        return inv_norms
+
+    def search(self, query_vectors, k=10):
+        """Return (scores, rows), each (n_queries, k), best match first"""
+        queries = _normalize(query_vectors)
+        k = min(k, len(self.embeddings))
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self.embeddings), self.block_rows):
+            block = np.asarray(self.embeddings[start:start + self.block_rows], dtype=np.float32)
+            scores = (queries @ block.T) * self.inv_norms[start:start + len(block)]
+            rows = np.arange(start, start + len(block), dtype=np.int64)
+            best_scores, best_rows = _merge_top_k(best_scores, best_rows, scores, rows, k)
+        return _sorted_top_k(best_scores, best_rows)
+
+
+class IVFIndex:
+    """Inverted-file index: rows are clustered with spherical k-means and a query
+    only scores the rows of its n_probe closest clusters.
+
+    The index is a directory of .npy files. Normalized vectors are stored as
+    float16 in cluster order, so every probed list is one contiguous read.
+    """
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, 'meta.json'), 'r') as file:
+            self.meta = json.load(file)
+        self.centroids = np.load(os.path.join(index_dir, 'centroids.npy'))
+        self.offsets = np.load(os.path.join(index_dir, 'offsets.npy'))
+        self.rows = np.load(os.path.join(index_dir, 'rows.npy'), mmap_mode='r')
+        self.vectors = np.load(os.path.join(index_dir, 'vectors.npy'), mmap_mode='r')
+
+    @classmethod
+    def build(cls, embeddings_path, index_dir, n_lists=None, sample_size=100000, iterations=20,
+              block_rows=DEFAULT_BLOCK_ROWS, seed=0):
+        embeddings = np.load(embeddings_path, mmap_mode='r')
+        n_rows, dim = embeddings.shape
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(n_rows)))
+        n_lists = min(n_lists, n_rows)
+        rng = np.random.default_rng(seed)
+
+        # Train centroids on a sample, spherical k-means on normalized rows
+        sample_rows = np.sort(rng.choice(n_rows, size=min(sample_size, n_rows), replace=False))
+        sample = _normalize(embeddings[sample_rows])
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.bincount(assignment, minlength=n_lists) == 0
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        # Assign every row, then lay the normalized vectors out list by list
+        assignment = np.empty(n_rows, dtype=np.int32)
+        for start in range(0, n_rows, block_rows):
+            block = _normalize(embeddings[start:start + block_rows])
+            assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind='stable').astype(np.int64)
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignment, minlength=n_lists))
+
+        os.makedirs(index_dir, exist_ok=True)
+        np.save(os.path.join(index_dir, 'centroids.npy'), centroids)
+        np.save(os.path.join(index_dir, 'offsets.npy'), offsets)
+        np.save(os.path.join(index_dir, 'rows.npy'), order)
+        vectors = np.lib.format.open_memmap(os.path.join(index_dir, 'vectors.npy'), mode='w+',
+                                            dtype=np.float16, shape=(n_rows, dim))
+        for start in range(0, n_rows, block_rows):
+            block_order = order[start:start + block_rows]
+            # Sorted gather keeps reads from the source memmap mostly sequential
+            gather = np.argsort(block_order)
+            block = np.empty((len(block_order), dim), dtype=np.float32)
+            block[gather] = _normalize(embeddings[block_order[gather]])
+            vectors[start:start + len(block)] = block
+        vectors.flush()
+        del vectors
+        with open(os.path.join(index_dir, 'meta.json'), 'w') as file:
+            json.dump({'embeddings_path': os.path.abspath(embeddings_path), 'n_lists': n_lists,
+                       'n_rows': int(n_rows), 'dim': int(dim)}, file)
+        return cls(index_dir)
+
+    def search(self, query_vectors, k=10, n_probe=8):
+        """Return (scores, rows), each (n_queries, k), best match first"""
+        queries = _normalize(query_vectors)
+        n_probe = min(n_probe, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), n_probe - 1, axis=1)[:, :n_probe]
+        all_scores = []
+        all_rows = []
+        for query, lists in zip(queries, probes):
+            best_scores = np.empty((1, 0), dtype=np.float32)
+            best_rows = np.empty((1, 0), dtype=np.int64)
+            for list_id in lists:
+                start, end = self.offsets[list_id], self.offsets[list_id + 1]
+                if start == end:
+                    continue
+                scores = np.asarray(self.vectors[start:end], dtype=np.float32) @ query
+                best_scores, best_rows = _merge_top_k(best_scores, best_rows, scores[None, :],
+                                                      np.asarray(self.rows[start:end]), k)
+            # Pad queries whose probed lists hold fewer than k rows
+            missing = k - best_scores.shape[1]
+            if missing > 0:
+                best_scores = np.pad(best_scores, ((0, 0), (0, missing)), constant_values=-np.inf)
+                best_rows = np.pad(best_rows, ((0, 0), (0, missing)), constant_values=-1)
+            all_scores.append(best_scores)
+            all_rows.append(best_rows)
+        return _sorted_top_k(np.vstack(all_scores), np.vstack(all_rows))
+
+
+def benchmark(exact, ivf, queries, k=10, n_probes=(1, 2, 4, 8, 16, 32)):
+    """Recall@k and latency of the IVF index against exact search"""
+    queries = np.atleast_2d(queries)
+    start = time.perf_counter()
+    _, truth = exact.search(queries, k=k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    results = [{'index': 'exact', 'n_probe': None, 'recall': 1.0, 'ms_per_query': exact_ms}]
+    for n_probe in n_probes:
+        start = time.perf_counter()
+        _, found = ivf.search(queries, k=k, n_probe=n_probe)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = np.mean([len(np.intersect1d(t, f)) / k for t, f in zip(truth, found)])
+        results.append({'index': 'ivf', 'n_probe': n_probe, 'recall': float(recall), 'ms_per_query': elapsed_ms})
+    return results
+
+
+def read_lines(text_file_path, rows):
+    """Fetch specific lines of a file by row number in one pass"""
+    wanted = set(int(row) for row in rows)
+    found = {}
+    with open(text_file_path, 'r', encoding='utf-8', newline='\n') as file:
+        for row, line in enumerate(file):
+            if row in wanted:
+                found[row] = line.rstrip('\n')
+                if len(found) == len(wanted):
+                    break
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cosine search over log line embeddings")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    query_parser = subparsers.add_parser('query', help="top-k lines for a free-text query")
+    query_parser.add_argument('embeddings')
+    query_parser.add_argument('text')
+    query_parser.add_argument('--k', type=int, default=10)
+    query_parser.add_argument('--log', help="log file the embeddings were generated from, to print matching lines")
+    query_parser.add_argument('--ivf', help="IVF index directory, exact search is used when omitted")
+    query_parser.add_argument('--n-probe', type=int, default=8)
+
+    build_parser = subparsers.add_parser('build-ivf', help="build a persisted IVF index")
+    build_parser.add_argument('embeddings')
+    build_parser.add_argument('index_dir')
+    build_parser.add_argument('--n-lists', type=int)
+
+    bench_parser = subparsers.add_parser('bench', help="recall vs latency of IVF against exact search")
+    bench_parser.add_argument('embeddings')
+    bench_parser.add_argument('index_dir')
+    bench_parser.add_argument('--queries', type=int, default=100)
+    bench_parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == 'build-ivf':
+        index = IVFIndex.build(args.embeddings, args.index_dir, n_lists=args.n_lists)
+        print(index.meta)
+    elif args.command == 'bench':
+        exact = ExactIndex(args.embeddings)
+        ivf = IVFIndex(args.index_dir)
+        # Use stored rows as queries so no model is needed
+        rows = np.random.default_rng(0).choice(len(exact.embeddings), size=min(args.queries, len(exact.embeddings)),
+                                               replace=False)
+        print(f"{'index':<8} {'n_probe':<8} {'recall@' + str(args.k):<10} {'ms/query':<10}")
+        for result in benchmark(exact, ivf, exact.embeddings[np.sort(rows)], k=args.k):
+            print(f"{result['index']:<8} {str(result['n_probe'] or '-'):<8} {result['recall']:<10.3f} "
+                  f"{result['ms_per_query']:<10.2f}")
+    else:
+        index = IVFIndex(args.ivf) if args.ivf else ExactIndex(args.embeddings)
+        query = embed_query(args.text, args.embeddings)
+        if args.ivf:
+            scores, rows = index.search(query, k=args.k, n_probe=args.n_probe)
+        else:
+            scores, rows = index.search(query, k=args.k)
+        lines = read_lines(args.log, rows[0]) if args.log else {}
+        for score, row in zip(scores[0], rows[0]):
+            print(f"{score:.4f}  {row:>8}  {lines.get(row, '')}")
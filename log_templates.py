@@ -0,0 +1,57 @@
+import re
+
+# Placeholder written in place of every variable token
+MASK = '<*>'
+
+# Variable parts of a log line, most specific first. Each match is replaced by MASK
+# so lines that only differ in timestamps, ids or addresses share one template.
+_VARIABLE_PATTERNS = [
+    # 2024-03-17 16:13:38,811 / 2024-03-17T16:13:38.811Z / 03-17 16:13:38.811
+    re.compile(r'\b(?:\d{4}-)?\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?\b'),
+    # Mar 17 16:13:38 / 17/Mar/2024:16:13:38
+    re.compile(r'\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{1,2}\s+\d{2}:\d{2}:\d{2}\b'),
+    re.compile(r'\b\d{1,2}/(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)/\d{4}(?::\d{2}:\d{2}:\d{2})?\b'),
+    re.compile(r'\b\d{2}:\d{2}:\d{2}(?:[.,]\d+)?\b'),
+    # UUIDs, IPv4 addresses (with optional port), 0x-prefixed addresses
+    re.compile(r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b'),
+    re.compile(r'\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b'),
+    re.compile(r'\b0[xX][0-9a-fA-F]+\b'),
+    # Bare hex ids such as object hashes (must contain a digit so words survive)
+    re.compile(r'\b(?=[0-9a-fA-F]*\d)[0-9a-fA-F]{6,}\b'),
+    # Any remaining standalone number: PIDs, TIDs, counters, sizes (t761 stays as is)
+    re.compile(r'(?<![A-Za-z0-9.])[-+]?\d+(?:\.\d+)?(?![A-Za-z0-9]|\.\d)'),
+]
+_REPEATED_MASKS = re.compile(re.escape(MASK) + r'(?:\s*' + re.escape(MASK) + r')+')
+
+
+def extract_template(line):
+    """Mask the variable tokens of a log line and return its template"""
+    template = line.strip()
+    for pattern in _VARIABLE_PATTERNS:
+        template = pattern.sub(MASK, template)
+    template = _REPEATED_MASKS.sub(MASK, template)
+    return ' '.join(template.split())
+
+
+def group_templates(lines):
+    """Group lines by template.
+
+    Returns (templates, representatives, inverse): the unique templates in order of
+    first appearance, the index of the first line that produced each template, and
+    for every input line the index of its template, so results computed once per
+    template can be fanned back out with [results[t] for t in inverse].
+    """
+    template_ids = {}
+    templates = []
+    representatives = []
+    inverse = []
+    for row, line in enumerate(lines):
+        template = extract_template(line)
+        template_id = template_ids.get(template)
+        if template_id is None:
+            template_id = len(templates)
+            template_ids[template] = template_id
+            templates.append(template)
+            representatives.append(row)
+        inverse.append(template_id)
+    return templates, representatives, inverse
@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+
+# Each kind maps to the transformers class that loads it
+CONFIG = 'config'
+TOKENIZER = 'tokenizer'
+EMBEDDING = 'embedding'
+QUESTION_ANSWERING = 'qa'
+
+_registry_lock = threading.Lock()
+_entry_locks = {}
+_loaded = {}
+load_times = {}
+
+
+def _load(kind, name):
+    # transformers is imported on first load so importing this module stays cheap
+    from transformers import BertConfig, BertForQuestionAnswering, BertModel, BertTokenizerFast
+
+    if kind == CONFIG:
+        return BertConfig.from_pretrained(name)
+    if kind == TOKENIZER:
+        # Rust-backed tokenizer: batch calls and offset mappings
+        return BertTokenizerFast.from_pretrained(name)
+    if kind == EMBEDDING:
+        model = BertModel.from_pretrained(name)
+    elif kind == QUESTION_ANSWERING:
+        model = BertForQuestionAnswering.from_pretrained(name)
+    else:
+        raise ValueError(f"Unknown model kind: {kind}")
+    model.eval()
+    return model
+
+
+def cached(key, factory):
+    """Return the cached object for key, building it with factory() on first use.
+
+    Concurrent callers of the same key wait for a single build instead of
+    building it twice.
+    """
+    with _registry_lock:
+        entry_lock = _entry_locks.setdefault(key, threading.Lock())
+    with entry_lock:
+        if key not in _loaded:
+            start = time.perf_counter()
+            _loaded[key] = factory()
+            load_times[key] = time.perf_counter() - start
+            logging.info(f"Loaded {key} in {load_times[key]:.2f}s")
+        return _loaded[key]
+
+
+def get(kind, name):
+    """Return the cached tokenizer or model for (kind, name), loading it on first use"""
+    return cached((kind, name), lambda: _load(kind, name))
+
+
+def get_config(name):
+    return get(CONFIG, name)
+
+
+def get_tokenizer(name):
+    return get(TOKENIZER, name)
+
+
+def get_embedding_model(name):
+    return get(EMBEDDING, name)
+
+
+def get_qa_model(name):
+    return get(QUESTION_ANSWERING, name)
+
+
+def prewarm(*entries):
+    """Load (kind, name) entries on a background thread and return the thread"""
+    def load_all():
+        for kind, name in entries:
+            try:
+                get(kind, name)
+            except Exception as e:
+                logging.error(f"Prewarming {kind} {name} failed: {str(e)}")
+
+    thread = threading.Thread(target=load_all, name='model-prewarm', daemon=True)
+    thread.start()
+    return thread
+
+
+def is_loaded(kind, name):
+    return (kind, name) in _loaded
+
+
+def clear():
+    """Drop every cached entry, mainly to free memory in long-lived processes"""
+    with _registry_lock:
+        _loaded.clear()
+        load_times.clear()
@@ -0,0 +1,131 @@
+import argparse
+import glob
+import hashlib
+import os
+import re
+import time
+import numpy as np
+
+# Financial PhraseBank files shipped with the repo; each one is a subset of the lower-agreement ones
+SENTENCE_FILES = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                             'Sentences_*Agree.txt')))
+SENTENCE_ENCODING = 'iso-8859-1'
+LABELS = ('negative', 'neutral', 'positive')
+
+# Compact copy of the parsed files, rebuilt when a source file is newer
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'log_models', 'phrasebank.npz')
+
+# One row per unique sentence; its text is text_bytes[offset:offset + length] (UTF-8)
+ROW_DTYPE = np.dtype([('hash', '<u8'), ('label', 'u1'), ('agreement', 'u1'), ('offset', '<i8'), ('length', '<i4')])
+
+_AGREEMENT = re.compile(r'Sentences_(\d+|All)Agree', re.IGNORECASE)
+
+
+def agreement_level(path):
+    """Annotator agreement of a file in percent: Sentences_66Agree.txt -> 66, AllAgree -> 100"""
+    match = _AGREEMENT.search(os.path.basename(path))
+    if match is None:
+        raise ValueError(f"Cannot tell the agreement level of {path}")
+    return 100 if match.group(1).lower() == 'all' else int(match.group(1))
+
+
+def sentence_hash(sentence):
+    return int.from_bytes(hashlib.blake2b(sentence.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class PhraseBank:
+    """Deduplicated sentences with their label and the highest agreement level they appear at"""
+
+    def __init__(self, rows, text_bytes):
+        self.rows = rows
+        self.text_bytes = text_bytes
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def labels(self):
+        return self.rows['label'].astype(np.int64)
+
+    @property
+    def agreement(self):
+        return self.rows['agreement']
+
+    def sentence(self, row):
+        offset, length = int(self.rows['offset'][row]), int(self.rows['length'][row])
+        return self.text_bytes[offset:offset + length].tobytes().decode('utf-8')
+
+    def sentences(self, rows=None):
+        rows = range(len(self)) if rows is None else rows
+        return [self.sentence(row) for row in rows]
+
+    def select(self, min_agreement=50):
+        """Row numbers of the sentences that at least min_agreement percent of annotators agreed on"""
+        return np.flatnonzero(self.rows['agreement'] >= min_agreement)
+
+
+def parse_phrasebank(paths=SENTENCE_FILES):
+    """Parse the `sentence@label` files in one pass, keeping each sentence once.
+
+    A sentence in several files keeps the label of its highest agreement level,
+    which is also the level recorded for it.
+    """
+    entries = {}
+    for path in sorted(paths, key=agreement_level):
+        level = agreement_level(path)
+        with open(path, 'r', encoding=SENTENCE_ENCODING) as file:
+            for line in file:
+                sentence, _, label = line.strip().rpartition('@')
+                if not sentence or label not in LABELS:
+                    continue
+                key = sentence_hash(sentence)
+                previous = entries.get(key)
+                entries[key] = (sentence if previous is None else previous[0], LABELS.index(label), level)
+
+    rows = np.zeros(len(entries), dtype=ROW_DTYPE)
+    encoded = [sentence.encode('utf-8') for sentence, _, _ in entries.values()]
+    lengths = np.fromiter((len(data) for data in encoded), dtype=np.int64, count=len(encoded))
+    rows['hash'] = np.fromiter(entries.keys(), dtype=np.uint64, count=len(entries))
+    rows['label'] = [label for _, label, _ in entries.values()]
+    rows['agreement'] = [level for _, _, level in entries.values()]
+    rows['length'] = lengths
+    rows['offset'] = np.cumsum(lengths) - lengths
+    text_bytes = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return PhraseBank(rows, text_bytes)
+
+
+def load_phrasebank(cache_path=DEFAULT_CACHE_PATH, paths=SENTENCE_FILES):
+    """Load the parsed sentences from cache_path, parsing (and caching) the text files only when needed"""
+    if cache_path and os.path.exists(cache_path):
+        cached_at = os.path.getmtime(cache_path)
+        if all(os.path.getmtime(path) <= cached_at for path in paths):
+            with np.load(cache_path) as arrays:
+                if sorted(map(str, arrays['sources'])) == sorted(os.path.basename(path) for path in paths):
+                    return PhraseBank(arrays['rows'], arrays['text'])
+
+    bank = parse_phrasebank(paths)
+    if cache_path:
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        tmp_path = cache_path + '.tmp.npz'
+        np.savez(tmp_path, rows=bank.rows, text=bank.text_bytes,
+                 sources=np.array([os.path.basename(path) for path in paths]))
+        os.replace(tmp_path, cache_path)
+    return bank
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse and deduplicate the Financial PhraseBank files")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH)
+    parser.add_argument('--rebuild', action='store_true')
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(args.cache):
+        os.remove(args.cache)
+    start = time.perf_counter()
+    bank = load_phrasebank(args.cache)
+    elapsed = time.perf_counter() - start
+    levels, counts = np.unique(bank.agreement, return_counts=True)
+    print(f"{len(bank)} unique sentences loaded in {elapsed * 1000:.1f} ms, "
+          f"{bank.rows.nbytes + bank.text_bytes.nbytes} bytes")
+    for level, count in zip(levels, counts):
+        print(f"  highest agreement {level}%: {count}")
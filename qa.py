@@ -1,40 +1,494 @@
+import math
 import sys
+import threading
+import time
+from collections import deque
 import cv2
 import numpy as np
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QFileDialog, QLabel, QSlider, QScrollArea, QFrame,
-                             QLineEdit, QGridLayout, QComboBox)
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal
-from PyQt5.QtGui import QImage, QPixmap, QPainter, QPen
+                             QLineEdit, QGridLayout, QComboBox, QAbstractScrollArea)
+from PyQt5.QtCore import Qt, QTimer, QThread, QEvent, QRect, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap, QPainter, QPen, QColor
 from moviepy import VideoFileClip, concatenate_videoclips
 from pathlib import Path
+from thumbnail_cache import ThumbnailCache, video_key
+
+# Timeline thumbnails: one every THUMBNAIL_INTERVAL seconds, scaled to fit THUMBNAIL_WIDTH x THUMBNAIL_HEIGHT
+THUMBNAIL_INTERVAL = 5
+THUMBNAIL_WIDTH = 120
+THUMBNAIL_HEIGHT = 90
+
+# Decoded frames the playback thread may read ahead of the playhead
+FRAME_BUFFER_SIZE = 8
+# Playback stops once this many frames in a row fail to decode; fewer are skipped
+MAX_BAD_FRAMES = 25
+
+# Timeline tile layout: thumbnail, timestamp and "Add Cut" strip stacked in a column per thumbnail
+TILE_SPACING = 8
+TILE_MARGIN = 2
+TIME_LABEL_HEIGHT = 16
+CUT_BUTTON_HEIGHT = 20
+TILE_STRIDE = THUMBNAIL_WIDTH + TILE_SPACING
+TILE_HEIGHT = 2 * TILE_MARGIN + THUMBNAIL_HEIGHT + TIME_LABEL_HEIGHT + CUT_BUTTON_HEIGHT + 4
+# Thumbnails per row of the pixmap atlas; rows keep the atlas well inside Qt's 32767 px limit
+ATLAS_COLUMNS = 64
+
+
+def thumbnail_times(duration, interval=THUMBNAIL_INTERVAL):
+    """Timestamps of the timeline thumbnails for a video of the given duration"""
+    num_frames = int(duration // interval)  # Integer division to get complete intervals
+    # Only add extra frame if remaining time is significant (more than 0.5 seconds)
+    if duration % interval > 0.5:
+        num_frames += 1
+    times = []
+    for i in range(num_frames):
+        if i == 0:
+            times.append(0)  # First frame at exactly 0
+        elif i == num_frames - 1:
+            # For last frame, use either the last complete interval or actual end
+            times.append(min(i * interval, max(0, duration - 0.03)))  # Small offset from end
+        else:
+            times.append(i * interval)
+    return times
+
+
+def to_rgb(frame):
+    """Convert a decoded frame to 3-channel RGB, or None if it cannot be used"""
+    if frame is None or frame.size == 0:
+        return None
+    if len(frame.shape) == 2:  # Grayscale
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB)
+    if frame.shape[2] == 4:  # RGBA
+        return cv2.cvtColor(frame, cv2.COLOR_RGBA2RGB)
+    if frame.shape[2] == 3:  # Already RGB
+        return frame
+    return None
+
+
+def scale_to_fit(frame, max_width, max_height):
+    """Resize an RGB frame to fit max_width x max_height, keeping its aspect ratio"""
+    height, width = frame.shape[:2]
+    aspect_ratio = width / height
+    if aspect_ratio > max_width / max_height:
+        # Width-constrained
+        new_width, new_height = max_width, max(1, int(max_width / aspect_ratio))
+    else:
+        # Height-constrained
+        new_width, new_height = max(1, int(max_height * aspect_ratio)), max_height
+    # INTER_AREA averages the source pixels when shrinking, which also makes it the fast choice for 1080p
+    interpolation = cv2.INTER_AREA if new_width < width else cv2.INTER_LINEAR
+    return np.ascontiguousarray(cv2.resize(frame, (new_width, new_height), interpolation=interpolation))
+
+
+def scale_thumbnail(frame):
+    """Shrink an RGB frame to fit THUMBNAIL_WIDTH x THUMBNAIL_HEIGHT, keeping its aspect ratio"""
+    return scale_to_fit(frame, THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT)
+
+
+def thumbnail_image(pixels, sizes, index):
+    """QImage of one thumbnail in a packed (N, THUMBNAIL_HEIGHT, THUMBNAIL_WIDTH, 3) array, or None"""
+    width, height = (int(value) for value in sizes[index])
+    if width == 0 or height == 0:
+        return None
+    # copy(): the QImage must own its pixels once the numpy buffer goes away
+    return QImage(pixels[index].data, width, height, 3 * THUMBNAIL_WIDTH, QImage.Format_RGB888).copy()
+
+
+class ThumbnailWorker(QThread):
+    """Decodes timeline thumbnails off the GUI thread.
+
+    Opens its own VideoFileClip (readers must not be shared between threads),
+    always decodes the pending thumbnail nearest to the playhead next, and emits
+    each pre-scaled thumbnail as soon as it is ready. cancel() stops it after the
+    frame it is decoding. A complete set is stored in the thumbnail cache.
+    """
+    thumbnail_ready = pyqtSignal(int, QImage)  # index in the timeline, scaled RGB image
+
+    def __init__(self, filename, times, playhead=0.0, cache=None, cache_key=None, parent=None):
+        super().__init__(parent)
+        self.filename = filename
+        self.times = list(times)
+        self.playhead = playhead
+        self.cache = cache
+        self.cache_key = cache_key
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def set_playhead(self, playhead):
+        """Re-prioritize the remaining thumbnails around a new playhead position"""
+        self.playhead = playhead
+
+    def run(self):
+        pixels = np.zeros((len(self.times), THUMBNAIL_HEIGHT, THUMBNAIL_WIDTH, 3), dtype=np.uint8)
+        sizes = np.zeros((len(self.times), 2), dtype=np.uint16)
+        clip = VideoFileClip(self.filename, audio=False)
+        try:
+            pending = set(range(len(self.times)))
+            while pending and not self._cancelled:
+                index = min(pending, key=lambda i: abs(self.times[i] - self.playhead))
+                pending.discard(index)
+                try:
+                    frame = to_rgb(clip.get_frame(self.times[index]))
+                except Exception as e:
+                    # A corrupt frame or a seek past the end only costs this thumbnail, its tile stays empty
+                    print(f"Could not decode thumbnail at {self.times[index]:.2f}s: {str(e)}")
+                    continue
+                if frame is None:
+                    continue  # Skip this frame
+                thumbnail = scale_thumbnail(frame)
+                height, width = thumbnail.shape[:2]
+                pixels[index, :height, :width] = thumbnail
+                sizes[index] = (width, height)
+                if not self._cancelled:
+                    self.thumbnail_ready.emit(index, thumbnail_image(pixels, sizes, index))
+        finally:
+            clip.close()
+        # A frame that failed to decode keeps size (0, 0): only a complete set is worth caching
+        if not self._cancelled and self.cache is not None and self.cache_key is not None and sizes.all():
+            try:
+                self.cache.save(self.cache_key, pixels, sizes)
+            except OSError as error:
+                print(f"Could not cache thumbnails: {error}")
+
+
+class FrameDecoder(QThread):
+    """Decodes playback frames ahead of the playhead into a bounded ring buffer.
+
+    Opens its own VideoFileClip and reads frames sequentially at the source frame
+    rate, already converted to RGB and scaled to the display size. It waits while
+    the buffer holds buffer_size frames. It also owns the playback clock: once
+    start_clock() is called, frames that fell behind the clock are skipped before
+    they are decoded, so a slow decoder shows fewer frames instead of drifting.
+    take_due() hands the GUI the most recent frame due on the clock and drops the
+    older ones; seek() flushes the buffer and continues from a new position.
+    A frame that fails to decode is skipped; failed is emitted if the clip cannot
+    be opened or MAX_BAD_FRAMES frames in a row fail.
+    """
+    failed = pyqtSignal(str)  # error message, the decoder has stopped
+
+    def __init__(self, filename, start_time, display_size, buffer_size=FRAME_BUFFER_SIZE, parent=None):
+        super().__init__(parent)
+        self.filename = filename
+        self.display_size = display_size  # (width, height) the frames are scaled to fit
+        self.buffer_size = buffer_size
+        self.frames = deque()  # (time, RGB frame), oldest first
+        self.condition = threading.Condition()
+        self.dropped = 0
+        self._seek_to = start_time
+        self._cancelled = False
+        # Playback was at _clock_position (seconds) when perf_counter() read _clock_started
+        self._clock_position = start_time
+        self._clock_started = None
+
+    def cancel(self):
+        with self.condition:
+            self._cancelled = True
+            self.condition.notify_all()
+
+    def seek(self, position):
+        """Drop the buffered frames and continue decoding from position (seconds)"""
+        with self.condition:
+            self.frames.clear()
+            self._seek_to = position
+            self._clock_position = position
+            self._clock_started = None
+            self.condition.notify_all()
+
+    def ready(self):
+        with self.condition:
+            return bool(self.frames)
+
+    def start_clock(self):
+        """Start the playback clock; called once the first frame after a start or seek is buffered"""
+        with self.condition:
+            if self._clock_started is None:
+                self._clock_started = time.perf_counter()
+
+    def clock(self):
+        """Current playback position in seconds, or None while the clock has not started"""
+        with self.condition:
+            return self._clock_time()
+
+    def _clock_time(self):
+        if self._clock_started is None:
+            return None
+        return self._clock_position + (time.perf_counter() - self._clock_started)
+
+    def take_due(self, clock_time):
+        """The latest buffered (time, frame) due at clock_time, or None; earlier due frames are dropped"""
+        due = None
+        with self.condition:
+            while self.frames and self.frames[0][0] <= clock_time:
+                if due is not None:
+                    self.dropped += 1
+                due = self.frames.popleft()
+            self.condition.notify_all()  # There is room to read ahead again
+        return due
+
+    def run(self):
+        try:
+            clip = VideoFileClip(self.filename, audio=False)
+        except Exception as e:
+            self.failed.emit(f"Could not open video for playback: {str(e)}")
+            return
+        try:
+            fps = clip.fps
+            last_index = int(clip.duration * fps) - 1
+            frame_index = 0
+            bad_frames = 0
+            while True:
+                with self.condition:
+                    while not self._cancelled and self._seek_to is None and (
+                            len(self.frames) >= self.buffer_size or frame_index > last_index):
+                        self.condition.wait()
+                    if self._cancelled:
+                        break
+                    if self._seek_to is not None:
+                        frame_index = min(max(0, int(self._seek_to * fps)), max(0, last_index))
+                        self._seek_to = None
+                    clock_time = self._clock_time()
+                    if clock_time is not None and frame_index / fps < clock_time:
+                        # Behind the clock: jump to the next frame not yet due instead of decoding late ones
+                        next_index = int(math.ceil(clock_time * fps))
+                        self.dropped += next_index - frame_index
+                        frame_index = next_index
+                        if frame_index > last_index:
+                            continue
+                frame_time = frame_index / fps
+                # Frames are requested in order, so the reader decodes forward without seeking
+                try:
+                    frame = to_rgb(clip.get_frame(frame_time))
+                    bad_frames = 0
+                except Exception as e:
+                    bad_frames += 1
+                    if bad_frames >= MAX_BAD_FRAMES:
+                        raise
+                    print(f"Skipping playback frame at {frame_time:.2f}s: {str(e)}")
+                    frame = None
+                if frame is not None:
+                    frame = scale_to_fit(frame, *self.display_size)
+                with self.condition:
+                    if self._seek_to is None and frame is not None:
+                        self.frames.append((frame_time, frame))
+                    frame_index += 1
+        except Exception as e:
+            print(f"Playback decoding stopped: {str(e)}")
+            self.failed.emit(f"Playback stopped: {str(e)}")
+        finally:
+            clip.close()
+
+
+class TimelineView(QAbstractScrollArea):
+    """Horizontally scrolling strip of timeline thumbnails, painted by hand.
+
+    Each thumbnail is a tile (image, timestamp, "Add Cut" strip) drawn in
+    paintEvent; only the tiles inside the viewport are painted, all from one
+    shared pixmap atlas, and clicks are hit-tested against the tile geometry.
+    The widget count is the same for any video length.
+    """
+    seek_requested = pyqtSignal(float)  # thumbnail clicked, time in seconds
+    add_cut_requested = pyqtSignal(float)  # "Add Cut" clicked, time in seconds
 
-class ClickableLabel(QLabel):
-    """A custom QLabel that emits a signal when clicked"""
-    clicked = pyqtSignal()
-    
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.timestamp = 0  # Store the timestamp this label represents
-        self.progress = 0  # Progress indicator (0-1)
-        self.setMinimumHeight(90)  # Ensure room for progress bar
-        
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        self.viewport().setMouseTracking(True)
+        self.setFixedHeight(TILE_HEIGHT + self.horizontalScrollBar().sizeHint().height() + 2 * self.frameWidth())
+        self.times = []
+        self.sizes = []  # (width, height) of each thumbnail in the atlas, (0, 0) until decoded
+        self.atlas = QPixmap()
+        self.playhead = 0.0
+        self.active_index = None  # tile under the playhead
+        self.hovered = (None, None)  # (tile index, 'frame' or 'cut')
+
+    def set_times(self, times):
+        """Start over with empty tiles at the given timestamps"""
+        self.times = list(times)
+        self.sizes = [(0, 0)] * len(self.times)
+        rows = max(1, -(-len(self.times) // ATLAS_COLUMNS))
+        self.atlas = QPixmap(ATLAS_COLUMNS * THUMBNAIL_WIDTH, rows * THUMBNAIL_HEIGHT)
+        self.atlas.fill(QColor('#2b2b2b'))
+        self.active_index = None
+        self.hovered = (None, None)
+        self.horizontalScrollBar().setValue(0)
+        self.update_scroll_range()
+        self.viewport().update()
+
+    def set_thumbnail(self, index, image):
+        """Copy one decoded thumbnail into the atlas and repaint its tile"""
+        painter = QPainter(self.atlas)
+        painter.drawImage(*self.atlas_position(index), image)
+        painter.end()
+        self.sizes[index] = (image.width(), image.height())
+        self.viewport().update(self.tile_rect(index))
+
+    def set_thumbnails(self, pixels, sizes):
+        """Build the whole atlas at once from a packed (N, THUMBNAIL_HEIGHT, THUMBNAIL_WIDTH, 3) array"""
+        rows = max(1, -(-len(pixels) // ATLAS_COLUMNS))
+        padded = np.zeros((rows * ATLAS_COLUMNS,) + pixels.shape[1:], dtype=np.uint8)
+        padded[:len(pixels)] = pixels
+        # (rows, columns, height, width, 3) -> one image of rows x columns slots
+        grid = np.ascontiguousarray(padded.reshape(rows, ATLAS_COLUMNS, THUMBNAIL_HEIGHT, THUMBNAIL_WIDTH, 3)
+                                    .transpose(0, 2, 1, 3, 4)
+                                    .reshape(rows * THUMBNAIL_HEIGHT, ATLAS_COLUMNS * THUMBNAIL_WIDTH, 3))
+        image = QImage(grid.data, grid.shape[1], grid.shape[0], grid.strides[0], QImage.Format_RGB888)
+        self.atlas = QPixmap.fromImage(image)
+        self.sizes = [(int(width), int(height)) for width, height in sizes]
+        self.viewport().update()
+
+    def set_playhead(self, current_time):
+        """Move the highlight; only the previously and newly active tiles are repainted"""
+        self.playhead = current_time
+        index = int(current_time // THUMBNAIL_INTERVAL)
+        if not 0 <= index < len(self.times) or current_time < self.times[index]:
+            index = None
+        if index != self.active_index:
+            if self.active_index is not None:
+                self.viewport().update(self.tile_rect(self.active_index))
+            self.active_index = index
+        if index is not None:
+            # Redraws the progress line too
+            self.viewport().update(self.frame_rect(index))
+
+    def content_width(self):
+        return len(self.times) * TILE_STRIDE
+
+    def update_scroll_range(self):
+        scroll_bar = self.horizontalScrollBar()
+        scroll_bar.setRange(0, max(0, self.content_width() - self.viewport().width()))
+        scroll_bar.setPageStep(self.viewport().width())
+        scroll_bar.setSingleStep(TILE_STRIDE)
+
+    def atlas_position(self, index):
+        return (index % ATLAS_COLUMNS) * THUMBNAIL_WIDTH, (index // ATLAS_COLUMNS) * THUMBNAIL_HEIGHT
+
+    def tile_rect(self, index):
+        """Area of a tile in viewport coordinates"""
+        x = index * TILE_STRIDE + TILE_SPACING // 2 - self.horizontalScrollBar().value()
+        return QRect(x, 0, THUMBNAIL_WIDTH, TILE_HEIGHT)
+
+    def frame_rect(self, index):
+        tile = self.tile_rect(index)
+        return QRect(tile.x(), TILE_MARGIN, THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT)
+
+    def time_rect(self, index):
+        tile = self.tile_rect(index)
+        return QRect(tile.x(), TILE_MARGIN + THUMBNAIL_HEIGHT + 2, THUMBNAIL_WIDTH, TIME_LABEL_HEIGHT)
+
+    def cut_rect(self, index):
+        tile = self.tile_rect(index)
+        return QRect(tile.x(), TILE_HEIGHT - TILE_MARGIN - CUT_BUTTON_HEIGHT, THUMBNAIL_WIDTH, CUT_BUTTON_HEIGHT)
+
+    def visible_range(self):
+        """First and one-past-last index of the tiles intersecting the viewport"""
+        offset = self.horizontalScrollBar().value()
+        first = max(0, offset // TILE_STRIDE)
+        last = min(len(self.times), (offset + self.viewport().width()) // TILE_STRIDE + 1)
+        return first, last
+
+    def hit_test(self, pos):
+        """(tile index, 'frame' or 'cut') under a viewport position, or (None, None)"""
+        index = (pos.x() + self.horizontalScrollBar().value() - TILE_SPACING // 2) // TILE_STRIDE
+        if not 0 <= index < len(self.times):
+            return None, None
+        if self.frame_rect(index).contains(pos):
+            return index, 'frame'
+        if self.cut_rect(index).contains(pos):
+            return index, 'cut'
+        return None, None
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.fillRect(event.rect(), QColor('#2b2b2b'))
+        font = painter.font()
+        first, last = self.visible_range()
+        for index in range(first, last):
+            if not self.tile_rect(index).intersects(event.rect()):
+                continue
+            timestamp = self.times[index]
+            frame = self.frame_rect(index)
+            active = index == self.active_index
+
+            # Thumbnail, centered in its frame, straight from the atlas
+            width, height = self.sizes[index]
+            if width and height:
+                atlas_x, atlas_y = self.atlas_position(index)
+                painter.drawPixmap(QRect(frame.x() + (THUMBNAIL_WIDTH - width) // 2,
+                                         frame.y() + (THUMBNAIL_HEIGHT - height) // 2, width, height),
+                                   self.atlas, QRect(atlas_x, atlas_y, width, height))
+            if active:
+                painter.setPen(QPen(QColor('#00ff00'), 2))
+            elif self.hovered == (index, 'frame'):
+                painter.setPen(QPen(QColor('#6d6d6d'), 1))
+            else:
+                painter.setPen(QPen(QColor('#3d3d3d'), 1))
+            painter.setBrush(Qt.NoBrush)
+            painter.drawRoundedRect(frame.adjusted(0, 0, -1, -1), 4, 4)
+            if active:
+                # Progress line through the current thumbnail's interval
+                x = frame.x() + int(THUMBNAIL_WIDTH * (self.playhead - timestamp) / THUMBNAIL_INTERVAL)
+                painter.setPen(QPen(Qt.green, 2))
+                painter.drawLine(x, frame.top(), x, frame.bottom())
+
+            font.setPixelSize(12)
+            painter.setFont(font)
+            painter.setPen(QColor('#ffffff'))
+            painter.drawText(self.time_rect(index), Qt.AlignCenter, f"{int(timestamp//60):02d}:{int(timestamp%60):02d}")
+
+            cut = self.cut_rect(index)
+            hovered = self.hovered == (index, 'cut')
+            painter.setPen(QPen(QColor('#4d4d4d' if hovered else '#3d3d3d'), 1))
+            painter.setBrush(QColor('#3d3d3d' if hovered else '#2b2b2b'))
+            painter.drawRoundedRect(cut.adjusted(0, 0, -1, -1), 4, 4)
+            font.setPixelSize(10)
+            painter.setFont(font)
+            painter.setPen(QColor('#ffffff'))
+            painter.drawText(cut, Qt.AlignCenter, "✂️ Add Cut")
+        painter.end()
+
+    def set_hovered(self, hovered):
+        if hovered == self.hovered:
+            return
+        for index, _ in (self.hovered, hovered):
+            if index is not None:
+                self.viewport().update(self.tile_rect(index))
+        self.hovered = hovered
+
+    def mouseMoveEvent(self, event):
+        self.set_hovered(self.hit_test(event.pos()))
+        super().mouseMoveEvent(event)
+
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
-            self.clicked.emit()
+            index, part = self.hit_test(event.pos())
+            if part == 'frame':
+                self.seek_requested.emit(float(self.times[index]))
+            elif part == 'cut':
+                self.add_cut_requested.emit(float(self.times[index]))
         super().mousePressEvent(event)
-        
-    def paintEvent(self, event):
-        super().paintEvent(event)
-        if self.progress > 0:
-            painter = QPainter(self)
-            painter.setRenderHint(QPainter.Antialiasing)
-            
-            # Draw progress line
-            pen = QPen(Qt.green, 2)
-            painter.setPen(pen)
-            x = int(self.width() * self.progress)
-            painter.drawLine(x, 0, x, self.height())
+
+    def viewportEvent(self, event):
+        if event.type() == QEvent.Leave:
+            self.set_hovered((None, None))
+        return super().viewportEvent(event)
+
+    def wheelEvent(self, event):
+        # The strip only scrolls sideways, so the vertical wheel moves it too
+        QApplication.sendEvent(self.horizontalScrollBar(), event)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_scroll_range()
+
+    def scrollContentsBy(self, dx, dy):
+        # Shift what is already painted; only the strip scrolled into view gets a paintEvent
+        self.viewport().scroll(dx, 0)
+
 
 class VideoEditor(QMainWindow):
     def __init__(self):
@@ -46,8 +500,12 @@ class VideoEditor(QMainWindow):
         self.current_frame = 0
         self.playing = False
         self.timer = QTimer()
-        self.timer.timeout.connect(self.update_frame)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.playback_tick)
+        self.frame_decoder = None
         self.edits = []  # List of (type, start_sec, end_sec, speed) tuples
+        self.thumbnail_worker = None
+        self.thumbnail_cache = ThumbnailCache()
         self.init_ui()
 
     def init_ui(self):
@@ -187,12 +645,17 @@ class VideoEditor(QMainWindow):
         # Timeline panel
         timeline_label = QLabel("Video Timeline Frames")
         left_layout.addWidget(timeline_label)
-        self.timeline_scroll = QScrollArea()
-        self.timeline_scroll.setWidgetResizable(True)
-        self.timeline_panel = QWidget()
-        self.timeline_layout = QHBoxLayout(self.timeline_panel)
-        self.timeline_scroll.setWidget(self.timeline_panel)
-        left_layout.addWidget(self.timeline_scroll)
+        self.timeline = TimelineView()
+        self.timeline.setStyleSheet("""
+            QAbstractScrollArea {
+                background-color: #2b2b2b;
+                border: 1px solid #3d3d3d;
+                border-radius: 4px;
+            }
+        """)
+        self.timeline.seek_requested.connect(self.timeline_frame_clicked)
+        self.timeline.add_cut_requested.connect(self.add_cut_at_time)
+        left_layout.addWidget(self.timeline)
 
         # Cut list panel
         cut_list_label = QLabel("Cut List")
@@ -393,34 +856,28 @@ class VideoEditor(QMainWindow):
 
     # Removed duplicate load_video method
 
+    def show_frame(self, frame):
+        """Blit an RGB frame already scaled to fit the video container"""
+        height, width = frame.shape[:2]
+        bytes_per_line = 3 * width
+        q_img = QImage(frame.data, width, height, bytes_per_line, QImage.Format_RGB888)
+        self.video_label.setPixmap(QPixmap.fromImage(q_img))
+
+    def display_size(self):
+        container_size = self.video_label.parent().size()
+        return container_size.width(), container_size.height()
+
     def update_frame(self):
+        """Show the frame at current_frame right away; used when paused and on every seek"""
         if self.video_clip is not None:
             try:
                 frame_time = max(0, min(self.current_frame / 1000.0, self.video_clip.duration))
-                frame = self.video_clip.get_frame(frame_time)
+                frame = to_rgb(self.video_clip.get_frame(frame_time))
                 if frame is None:
                     raise ValueError("Could not get frame")
                     
-                # Convert frame to RGB if necessary
-                if len(frame.shape) == 2:  # Grayscale
-                    frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB)
-                elif frame.shape[2] == 4:  # RGBA
-                    frame = cv2.cvtColor(frame, cv2.COLOR_RGBA2RGB)
-                    
-                height, width = frame.shape[:2]
-                bytes_per_line = 3 * width
-                q_img = QImage(frame.data, width, height, bytes_per_line, QImage.Format_RGB888)
-                pixmap = QPixmap.fromImage(q_img)
-                
-                # Calculate scaling to fit within the 640x480 container while maintaining aspect ratio
-                container_size = self.video_label.parent().size()
-                scaled_pixmap = pixmap.scaled(
-                    container_size.width(),
-                    container_size.height(),
-                    Qt.KeepAspectRatio,
-                    Qt.SmoothTransformation
-                )
-                self.video_label.setPixmap(scaled_pixmap)
+                # Scale to fit within the 640x480 container while maintaining aspect ratio
+                self.show_frame(scale_to_fit(frame, *self.display_size()))
                 self.time_slider.setValue(self.current_frame)
                 
                 # Update time display and highlighted frame
@@ -429,29 +886,73 @@ class VideoEditor(QMainWindow):
                 seconds = int(current_time % 60)
                 self.time_display.setText(f"{minutes:02d}:{seconds:02d}")
                 self.update_highlighted_frame(current_time)
-                
-                if self.playing:
-                    self.current_frame += 33  # Approximately 30 fps
-                    if self.current_frame >= int(self.video_clip.duration * 1000):
-                        self.playing = False
-                        self.play_button.setText("Play")
-                        self.timer.stop()
-                    else:
-                        # Scroll timeline while playing
-                        self.scroll_timeline_to_current_time()
+
+                if self.playing and self.frame_decoder is not None:
+                    # Seeking while playing: flush the read-ahead and restart the clock from here
+                    self.frame_decoder.seek(frame_time)
             except:
                 self.playing = False
                 self.play_button.setText("Play")
-                self.timer.stop()
+                self.stop_playback()
+
+    def playback_tick(self):
+        """Show the newest decoded frame due on the playback clock, dropping any that are late"""
+        if self.video_clip is None or self.frame_decoder is None:
+            return
+        current_time = self.frame_decoder.clock()
+        if current_time is None:
+            # Start the clock once the decoder has something to show, not while it is still opening the file
+            if not self.frame_decoder.ready():
+                return
+            self.frame_decoder.start_clock()
+            current_time = self.frame_decoder.clock()
+        if current_time >= self.video_clip.duration:
+            self.current_frame = int(self.video_clip.duration * 1000)
+            self.playing = False
+            self.play_button.setText("Play")
+            self.stop_playback()
+            return
+
+        due = self.frame_decoder.take_due(current_time)
+        if due is None:
+            return  # The frame on screen is still the current one
+        self.current_frame = int(current_time * 1000)
+        self.show_frame(due[1])
+        self.time_slider.setValue(self.current_frame)
+        # Scroll timeline while playing; also updates the time display and highlighted frame
+        self.scroll_timeline_to_current_time()
+
+    def start_playback(self):
+        self.stop_playback()
+        self.frame_decoder = FrameDecoder(self.current_video, self.current_frame / 1000.0, self.display_size())
+        self.frame_decoder.failed.connect(self.playback_failed)
+        self.frame_decoder.start()
+        # Tick at twice the source frame rate so each frame is shown close to when it is due
+        self.timer.start(max(1, int(500 / (self.video_clip.fps or 30))))
+
+    def stop_playback(self):
+        self.timer.stop()
+        if self.frame_decoder is not None:
+            self.frame_decoder.cancel()
+            self.frame_decoder.wait()
+            self.frame_decoder = None
+
+    def playback_failed(self, message):
+        if self.sender() is not self.frame_decoder:
+            return  # A decoder that was already replaced or stopped
+        self.playing = False
+        self.play_button.setText("Play")
+        self.stop_playback()
+        self.status_label.setText(message)
 
     def play_pause(self):
         self.playing = not self.playing
         if self.playing:
             self.play_button.setText("Pause")
-            self.timer.start(33)  # Approximately 30 fps
+            self.start_playback()
         else:
             self.play_button.setText("Play")
-            self.timer.stop()
+            self.stop_playback()
 
     def skip_back(self):
         self.current_frame = max(0, self.current_frame - 10000)  # 10 seconds
@@ -463,6 +964,9 @@ class VideoEditor(QMainWindow):
 
     def set_position(self, position):
         self.current_frame = position
+        if self.thumbnail_worker is not None:
+            # Decode the thumbnails around where the user jumped to first
+            self.thumbnail_worker.set_playhead(position / 1000.0)
         self.update_frame()
         self.scroll_timeline_to_current_time()
 
@@ -472,18 +976,18 @@ class VideoEditor(QMainWindow):
             
         # Calculate the position in the timeline
         current_time = self.current_frame / 1000.0  # Convert to seconds
-        total_width = self.timeline_panel.width()
+        total_width = self.timeline.content_width()
         duration = self.video_clip.duration
         
         # Calculate scroll position based on current time
         scroll_position = int((current_time / duration) * total_width)
         
         # Center the current frame in the scroll area
-        viewport_width = self.timeline_scroll.viewport().width()
+        viewport_width = self.timeline.viewport().width()
         scroll_position = max(0, scroll_position - (viewport_width // 2))
         
         # Scroll horizontally to the calculated position
-        self.timeline_scroll.horizontalScrollBar().setValue(scroll_position)
+        self.timeline.horizontalScrollBar().setValue(scroll_position)
         
         # Update the time display
         minutes = int(current_time // 60)
@@ -494,175 +998,62 @@ class VideoEditor(QMainWindow):
         self.update_highlighted_frame(current_time)
         
     def update_highlighted_frame(self, current_time):
-        # Find the closest frame in timeline
-        interval = 5  # Same interval as in populate_timeline
-        
-        # Update all frames
-        for i in range(self.timeline_layout.count()):
-            container = self.timeline_layout.itemAt(i).widget()
-            if container:
-                frame_label = container.layout().itemAt(0).widget()
-                if isinstance(frame_label, ClickableLabel) and hasattr(frame_label, 'timestamp'):
-                    frame_time = frame_label.timestamp
-                    
-                    # Calculate progress within this frame's interval
-                    if frame_time <= current_time < frame_time + interval:
-                        progress = (current_time - frame_time) / interval
-                        frame_label.progress = progress
-                        frame_label.setStyleSheet("""
-                            QLabel {
-                                background-color: #2b2b2b;
-                                border: 2px solid #00ff00;
-                                border-radius: 4px;
-                            }
-                        """)
-                    else:
-                        frame_label.progress = 0
-                        frame_label.setStyleSheet("""
-                            QLabel {
-                                background-color: #2b2b2b;
-                                border: 1px solid #3d3d3d;
-                                border-radius: 4px;
-                            }
-                            QLabel:hover {
-                                border: 1px solid #6d6d6d;
-                            }
-                        """)
-                    frame_label.update()  # Force repaint
+        # The timeline draws the highlight and progress line of the thumbnail under the playhead
+        self.timeline.set_playhead(current_time)
 
     def populate_timeline(self):
-        # Clear previous frames
-        for i in reversed(range(self.timeline_layout.count())):
-            widget = self.timeline_layout.itemAt(i).widget()
-            if widget:
-                widget.setParent(None)
+        # Stop decoding thumbnails of the previous video
+        self.stop_thumbnail_worker()
 
-        # Add actual video frames every 5 seconds
-        duration = self.video_clip.duration
-        interval = 5  # 5 seconds between frames
-        
-        # Calculate exact number of frames needed
-        num_frames = int(duration // interval)  # Integer division to get complete intervals
-        remaining_time = duration % interval
-        
-        # Only add extra frame if remaining time is significant (more than 0.5 seconds)
-        if remaining_time > 0.5:
-            num_frames += 1
-        
-        for i in range(num_frames):
-            # Special handling for first and last frames
-            if i == 0:
-                time = 0  # First frame at exactly 0
-            elif i == num_frames - 1:
-                # For last frame, use either the last complete interval or actual end
-                time = min(i * interval, max(0, duration - 0.03))  # Small offset from end
-            else:
-                time = i * interval
-                
-            # Create frame preview with proper error handling
-            frame = self.video_clip.get_frame(time)
-            
-            # Ensure frame is not None and has valid dimensions
-            if frame is None or frame.size == 0:
-                continue  # Skip this frame
-            
-            # Convert frame to RGB if necessary
-            if len(frame.shape) == 2:  # Grayscale
-                frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB)
-            elif frame.shape[2] == 4:  # RGBA
-                frame = cv2.cvtColor(frame, cv2.COLOR_RGBA2RGB)
-            elif frame.shape[2] == 3:  # Already RGB
-                pass
-            else:
-                continue  # Skip invalid frame format
-            
-            height, width = frame.shape[:2]
-            if height == 0 or width == 0:
-                continue  # Skip invalid dimensions
-            # Calculate aspect ratio and target dimensions
-            target_width = 120
-            target_height = 90
-            aspect_ratio = width / height
-            
-            # Adjust dimensions to maintain aspect ratio
-            if aspect_ratio > target_width / target_height:
-                # Width-constrained
-                new_width = target_width
-                new_height = int(target_width / aspect_ratio)
-            else:
-                # Height-constrained
-                new_height = target_height
-                new_width = int(target_height * aspect_ratio)
-                
-            bytes_per_line = 3 * width
-            q_img = QImage(frame.data, width, height, bytes_per_line, QImage.Format_RGB888)
-            frame_pixmap = QPixmap.fromImage(q_img)
-            
-            # Create container widget for frame and timestamp
-            container = QWidget()
-            container_layout = QVBoxLayout(container)
-            
-            # Frame preview
-            frame_label = ClickableLabel()  # Using custom ClickableLabel instead of QLabel
-            frame_label.setFixedSize(120, 90)
-            frame_label.setPixmap(frame_pixmap.scaled(
-                new_width, new_height, Qt.KeepAspectRatio, Qt.SmoothTransformation
-            ))
-            # Center the pixmap in the label
-            frame_label.setAlignment(Qt.AlignCenter)
-            frame_label.setStyleSheet("""
-                QLabel {
-                    background-color: #2b2b2b;
-                    border: 1px solid #3d3d3d;
-                    border-radius: 4px;
-                }
-                QLabel:hover {
-                    border: 1px solid #6d6d6d;
-                }
-            """)
-            # Store the timestamp in the label and connect click handler
-            frame_label.timestamp = time
-            frame_label.clicked.connect(self.timeline_frame_clicked)
-            
-            # Timestamp label
-            time_label = QLabel(f"{int(time//60):02d}:{int(time%60):02d}")
-            time_label.setAlignment(Qt.AlignCenter)
-            
-            # Add Cut button
-            add_cut_button = QPushButton("✂️ Add Cut")
-            add_cut_button.setStyleSheet("""
-                QPushButton {
-                    background-color: #2b2b2b;
-                    color: white;
-                    border: 1px solid #3d3d3d;
-                    border-radius: 4px;
-                    padding: 3px;
-                    font-size: 10px;
-                }
-                QPushButton:hover {
-                    background-color: #3d3d3d;
-                    border: 1px solid #4d4d4d;
-                }
-            """)
-            add_cut_button.clicked.connect(lambda checked, t=time: self.add_cut_at_time(t))
-            
-            container_layout.addWidget(frame_label)
-            container_layout.addWidget(time_label)
-            container_layout.addWidget(add_cut_button)
-            container_layout.setSpacing(2)
-            container_layout.setContentsMargins(2, 2, 2, 2)
-            
-            self.timeline_layout.addWidget(container)
+        # Empty tiles for a frame every THUMBNAIL_INTERVAL seconds, filled in as the worker decodes them
+        times = thumbnail_times(self.video_clip.duration)
+        self.timeline.set_times(times)
+
+        # A video opened before with the same size and mtime shows its thumbnails straight from disk
+        try:
+            cache_key = video_key(self.current_video, THUMBNAIL_INTERVAL, THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT)
+        except OSError:
+            cache_key = None
+        cached = self.thumbnail_cache.load(cache_key) if cache_key else None
+        if cached is not None and len(cached[0]) == len(times):
+            self.timeline.set_thumbnails(*cached)
+            return
+
+        self.thumbnail_worker = ThumbnailWorker(self.current_video, times, playhead=self.current_frame / 1000.0,
+                                                cache=self.thumbnail_cache, cache_key=cache_key)
+        self.thumbnail_worker.thumbnail_ready.connect(self.set_timeline_thumbnail)
+        self.thumbnail_worker.start()
 
-    def timeline_frame_clicked(self):
+    def set_timeline_thumbnail(self, index, image):
+        """Show a thumbnail decoded by the worker; late results of a cancelled worker are dropped"""
+        if self.sender() is not self.thumbnail_worker or index >= len(self.timeline.times):
+            return
+        self.timeline.set_thumbnail(index, image)
+
+    def stop_thumbnail_worker(self):
+        if self.thumbnail_worker is not None:
+            self.thumbnail_worker.cancel()
+            self.thumbnail_worker.wait()
+            self.thumbnail_worker = None
+
+    def timeline_frame_clicked(self, timestamp):
         """Handler for when a frame in the timeline is clicked"""
-        frame_label = self.sender()  # Get the label that was clicked
-        if hasattr(frame_label, 'timestamp'):
-            # Convert timestamp to milliseconds for current_frame
-            self.current_frame = int(frame_label.timestamp * 1000)
-            self.update_frame()
-            # Update slider position
-            self.time_slider.setValue(self.current_frame)
+        # Convert timestamp to milliseconds for current_frame
+        self.current_frame = int(timestamp * 1000)
+        self.update_frame()
+        # Update slider position
+        self.time_slider.setValue(self.current_frame)
+
+    def add_cut_at_time(self, timestamp):
+        """Prefill a cut over the thumbnail's interval, starting at its timestamp"""
+        if self.video_clip is None:
+            return
+        start = int(timestamp)
+        end = max(start + 1, min(int(timestamp + THUMBNAIL_INTERVAL), int(self.video_clip.duration)))
+        self.operation_combo.setCurrentIndex(0)  # Cut
+        self.from_time.setText(f"{start//60:02d}:{start%60:02d}")
+        self.to_time.setText(f"{end//60:02d}:{end%60:02d}")
+        self.status_label.setText("Adjust the range if needed, then press Add Edit")
             
     def parse_time(self, time_str):
         try:
@@ -931,6 +1322,11 @@ class VideoEditor(QMainWindow):
         filename, _ = QFileDialog.getOpenFileName(self, "Open Video File", "", "Video Files (*.mp4 *.avi *.mkv *.webm)")
         if filename:
             try:
+                # A new load cancels thumbnails still being decoded for the old video
+                self.stop_thumbnail_worker()
+                self.playing = False
+                self.play_button.setText("Play")
+                self.stop_playback()
                 if self.video_clip is not None:
                     self.video_clip.close()
                 self.current_video = filename
@@ -957,6 +1353,8 @@ class VideoEditor(QMainWindow):
             self.update_edit_list()
 
     def closeEvent(self, event):
+        self.stop_playback()
+        self.stop_thumbnail_worker()
         if self.video_clip:
             self.video_clip.close()
         event.accept()
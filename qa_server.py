@@ -0,0 +1,234 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import inference_backends
+import model_registry
+import splunk
+from answer_cache import AnswerCache
+
+# A batch is run once it holds MAX_BATCH_SIZE pairs or its first pair has waited MAX_WAIT_MS
+MAX_BATCH_SIZE = 16
+MAX_WAIT_MS = 10
+
+# Latencies kept for the percentiles reported by /stats
+LATENCY_WINDOW = 10000
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+
+class MicroBatcher:
+    """Coalesces concurrent (question, context) pairs into batched forward passes.
+
+    Pairs wait in an asyncio queue. The batching loop takes the first waiting
+    pair, then keeps collecting until the batch is full or the first pair's
+    deadline passes, and answers the whole batch with one answer_batch call on a
+    worker thread so the event loop keeps accepting requests meanwhile. Answer
+    cache lookups and writes run on their own thread, so a cache hit never waits
+    behind a batch.
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, cache=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        # One inference thread: batches run one after another, each using all the cores torch is given
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='qa-batch')
+        self.cache_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='qa-cache')
+        self.batch_sizes = Counter()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.answered = 0
+
+    async def answer(self, question, context, source=None):
+        """Queue one pair and wait for its result dict (see splunk.answer_batch)"""
+        loop = asyncio.get_running_loop()
+        if self.cache is not None:
+            # Cached answers skip the queue entirely
+            cached = (await loop.run_in_executor(
+                self.cache_executor, lambda: self.cache.get_many([question], [context], sources=[source],
+                                                                 settings=splunk.reader_settings())))[0]
+            if cached is not None:
+                return cached
+        future = loop.create_future()
+        await self.queue.put((question, context, source, future, time.perf_counter()))
+        return await future
+
+    async def answer_many(self, questions, contexts, sources=None):
+        sources = sources or [None] * len(contexts)
+        return await asyncio.gather(*(self.answer(question, context, source)
+                                      for question, context, source in zip(questions, contexts, sources)))
+
+    async def _next_batch(self):
+        batch = [await self.queue.get()]
+        deadline = batch[0][4] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                # Still take what is already waiting, it costs nothing to add
+                if self.queue.empty():
+                    break
+                batch.append(self.queue.get_nowait())
+                continue
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            questions = [question for question, _, _, _, _ in batch]
+            contexts = [context for _, context, _, _, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self._answer_batch, questions, contexts)
+            except Exception:
+                # Retry the pairs one at a time so only the pair that fails gets the error,
+                # not every request that happened to be batched with it
+                results = []
+                for question, context in zip(questions, contexts):
+                    try:
+                        results += await loop.run_in_executor(self.executor, self._answer_batch,
+                                                              [question], [context])
+                    except Exception as error:
+                        results.append(error)
+            finished = time.perf_counter()
+            self.batch_sizes[len(batch)] += 1
+            answered = []
+            for item, result in zip(batch, results):
+                _, _, _, future, queued = item
+                if isinstance(result, Exception):
+                    if not future.done():
+                        future.set_exception(result)
+                    continue
+                answered.append((item, result))
+                self.latencies.append(finished - queued)
+                if not future.done():
+                    future.set_result(result)
+            self.answered += len(answered)
+            if self.cache is not None and answered:
+                await loop.run_in_executor(self.cache_executor, lambda: self.cache.put_many(
+                    [question for (question, _, _, _, _), _ in answered],
+                    [context for (_, context, _, _, _), _ in answered],
+                    [result for _, result in answered],
+                    sources=[source for (_, _, source, _, _), _ in answered], settings=splunk.reader_settings()))
+
+    def _answer_batch(self, questions, contexts):
+        return splunk.answer_batch(self.model, self.tokenizer, questions, contexts, batch_size=self.max_batch_size)
+
+    def stats(self):
+        latencies = np.asarray(self.latencies, dtype=np.float64) * 1000
+        return {
+            'queue_depth': self.queue.qsize(),
+            'answered': self.answered,
+            'batch_size_histogram': {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+            'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+            'cache': self.cache.stats() if self.cache is not None else None,
+        }
+
+
+class QAServer:
+    """JSON over HTTP in front of a MicroBatcher.
+
+    POST /answer {"question": ..., "context": ...} reads the given context; without
+    a context the question is answered over the log index with retrieve-then-read,
+    every retrieved candidate going through the shared batcher. GET /stats reports
+    queue depth, the batch size histogram and p50/p99 latency.
+    """
+
+    def __init__(self, batcher, index=None, candidates=splunk.DEFAULT_CANDIDATES):
+        self.batcher = batcher
+        self.index = index
+        self.candidates = candidates
+
+    async def handle_answer(self, request):
+        question = request.get('question')
+        if not question:
+            return 400, {'error': "missing 'question'"}
+        if request.get('context'):
+            result = await self.batcher.answer(question, request['context'])
+            return 200, {'answer': result['answer'], 'score': splunk.json_score(result['score'])}
+        if self.index is None:
+            return 400, {'error': "no 'context' given and the server has no log index"}
+        hits = self.index.search(question, k=int(request.get('k', self.candidates)))
+        results = await self.batcher.answer_many([question] * len(hits), [hit['text'] for hit in hits],
+                                                 sources=[hit['file'] for hit in hits])
+        return 200, splunk.best_answer(results, hits)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+            if len(request_line) < 2:
+                status, payload = 400, {'error': 'bad request'}
+            elif request_line[0] == 'GET' and request_line[1] == '/stats':
+                status, payload = 200, self.batcher.stats()
+            elif request_line[0] == 'POST' and request_line[1] == '/answer':
+                try:
+                    status, payload = await self.handle_answer(json.loads(body or b'{}'))
+                except json.JSONDecodeError:
+                    status, payload = 400, {'error': 'body is not JSON'}
+            else:
+                status, payload = 404, {'error': 'not found'}
+        except Exception as error:
+            status, payload = 500, {'error': str(error)}
+
+        data = json.dumps(payload).encode('utf-8')
+        reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}[status]
+        writer.write(f'HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n'
+                     f'Content-Length: {len(data)}\r\nConnection: close\r\n\r\n'.encode('latin-1') + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        batching = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"answering on http://{host}:{port}/answer, stats on /stats")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batching.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Long-lived log QA service with dynamic micro-batching")
+    parser.add_argument('log_dir', nargs='?', help="log directory indexed for questions sent without a context")
+    parser.add_argument('--index', help="BM25 index file, built from log_dir and saved here if missing or stale")
+    parser.add_argument('--window', type=int, default=splunk.DEFAULT_WINDOW_LINES)
+    parser.add_argument('--candidates', type=int, default=splunk.DEFAULT_CANDIDATES)
+    parser.add_argument('--backend', choices=inference_backends.BACKENDS, default=inference_backends.EAGER)
+    parser.add_argument('--max-batch-size', type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS)
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--answer-cache', help="SQLite file that keeps answers across restarts")
+    args = parser.parse_args()
+
+    index = splunk.load_log_index(args.index, args.log_dir, window=args.window)
+
+    reader = inference_backends.get_backend(args.backend, model_registry.QUESTION_ANSWERING, splunk.QA_MODEL_NAME)
+    tokenizer = model_registry.get_tokenizer(splunk.QA_TOKENIZER_NAME)
+    answer_cache = AnswerCache(args.answer_cache, f'{splunk.QA_MODEL_NAME}:{args.backend}')
+    batcher = MicroBatcher(reader, tokenizer, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms,
+                           cache=answer_cache)
+    asyncio.run(QAServer(batcher, index=index, candidates=args.candidates).serve(args.host, args.port))
@@ -0,0 +1,184 @@
+import argparse
+import json
+import time
+import numpy as np
+import emdeddings
+import inference_backends
+from embedding_cache import DEFAULT_MAX_BYTES, EmbeddingCache
+from phrasebank import LABELS, load_phrasebank
+
+# Sentences per embedding call when tagging a feed
+DEFAULT_CLASSIFY_CHUNK = 8192
+
+
+def load_labelled_sentences(min_agreement=50):
+    """Unique sentences and label ids, keeping those at least min_agreement percent of annotators agreed on"""
+    bank = load_phrasebank()
+    rows = bank.select(min_agreement)
+    return bank.sentences(rows), bank.labels[rows]
+
+
+class SoftmaxClassifier:
+    """Multinomial logistic regression on standardized embeddings, trained with full-batch gradient descent"""
+
+    kind = 'softmax'
+
+    def __init__(self, l2=1e-3, learning_rate=None, epochs=300):
+        self.l2 = l2
+        self.learning_rate = learning_rate
+        self.epochs = epochs
+        self.mean = None
+        self.scale = None
+        self.weights = None
+        self.bias = None
+
+    def _standardize(self, x):
+        return (np.asarray(x, dtype=np.float32) - self.mean) / self.scale
+
+    def fit(self, x, y):
+        x = np.asarray(x, dtype=np.float32)
+        self.mean = x.mean(axis=0)
+        self.scale = x.std(axis=0) + 1e-6
+        x = self._standardize(x)
+        targets = np.eye(len(LABELS), dtype=np.float32)[y]
+        self.weights = np.zeros((x.shape[1], len(LABELS)), dtype=np.float32)
+        self.bias = np.zeros(len(LABELS), dtype=np.float32)
+        # 1 / Lipschitz constant of the loss gradient, so descent converges for any embedding width
+        learning_rate = self.learning_rate or 1 / (0.5 * np.linalg.norm(x, 2) ** 2 / len(x) + self.l2)
+        for _ in range(self.epochs):
+            error = (self._softmax(x @ self.weights + self.bias) - targets) / len(x)
+            self.weights -= learning_rate * (x.T @ error + self.l2 * self.weights)
+            self.bias -= learning_rate * error.sum(axis=0)
+        return self
+
+    @staticmethod
+    def _softmax(logits):
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, x):
+        return self._softmax(self._standardize(x) @ self.weights + self.bias)
+
+    def predict(self, x):
+        return (self._standardize(x) @ self.weights + self.bias).argmax(axis=1)
+
+    def arrays(self):
+        return {'mean': self.mean, 'scale': self.scale, 'weights': self.weights, 'bias': self.bias}
+
+
+class NearestCentroidClassifier:
+    """Assigns the label whose mean unit-normalized embedding has the highest cosine similarity"""
+
+    kind = 'centroid'
+
+    def __init__(self):
+        self.centroids = None
+
+    @staticmethod
+    def _normalize(x):
+        x = np.asarray(x, dtype=np.float32)
+        return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+    def fit(self, x, y):
+        x = self._normalize(x)
+        self.centroids = self._normalize(np.stack([x[y == label].mean(axis=0) for label in range(len(LABELS))]))
+        return self
+
+    def predict_proba(self, x):
+        similarity = self._normalize(x) @ self.centroids.T
+        return SoftmaxClassifier._softmax(similarity * 10)
+
+    def predict(self, x):
+        return (self._normalize(x) @ self.centroids.T).argmax(axis=1)
+
+    def arrays(self):
+        return {'centroids': self.centroids}
+
+
+HEADS = {head.kind: head for head in (SoftmaxClassifier, NearestCentroidClassifier)}
+
+
+def save_head(head, path):
+    np.savez(path, kind=head.kind, model=emdeddings.model_name,
+             settings=json.dumps(emdeddings.recorded_settings()), **head.arrays())
+
+
+def load_head(path):
+    """Load a head and switch to the embedding settings it was trained with, like emdeddings.apply_saved_settings"""
+    with np.load(path) as arrays:
+        if 'settings' in arrays:
+            emdeddings.apply_recorded_settings(json.loads(str(arrays['settings'])), path)
+        elif 'model' in arrays and str(arrays['model']) != emdeddings.model_name:
+            # Saved before the settings were recorded, only the model can be checked
+            raise ValueError(f"{path} was trained on {arrays['model']} embeddings, not {emdeddings.model_name}")
+        head = HEADS[str(arrays['kind'])]()
+        for name in head.arrays():
+            setattr(head, name, arrays[name])
+    return head
+
+
+def embed_sentences(sentences, batch_size=emdeddings.DEFAULT_BATCH_SIZE, cache=None):
+    """Embed each distinct sentence once; repeats across calls are served by the cache"""
+    unique, inverse = np.unique(np.asarray(sentences, dtype=object), return_inverse=True)
+    return emdeddings.embed_lines(list(unique), batch_size=batch_size, cache=cache)[inverse]
+
+
+def train(head_kind='softmax', test_share=0.2, seed=0, batch_size=emdeddings.DEFAULT_BATCH_SIZE, cache=None,
+          min_agreement=50):
+    """Fit a head on the PhraseBank sentences and report held-out accuracy"""
+    sentences, labels = load_labelled_sentences(min_agreement)
+    embeddings = embed_sentences(sentences, batch_size=batch_size, cache=cache)
+    order = np.random.default_rng(seed).permutation(len(sentences))
+    test_size = int(len(order) * test_share)
+    test, fit = order[:test_size], order[test_size:]
+    head = HEADS[head_kind]().fit(embeddings[fit], labels[fit])
+    accuracy = float((head.predict(embeddings[test]) == labels[test]).mean()) if test_size else None
+    return head, {'sentences': len(sentences), 'train': len(fit), 'test': test_size, 'accuracy': accuracy}
+
+
+def classify(sentences, head, batch_size=emdeddings.DEFAULT_BATCH_SIZE, cache=None, chunk=DEFAULT_CLASSIFY_CHUNK):
+    """Yield (sentence, label, confidence) for a large list of sentences, chunk by chunk"""
+    for start in range(0, len(sentences), chunk):
+        part = sentences[start:start + chunk]
+        probabilities = head.predict_proba(embed_sentences(part, batch_size=batch_size, cache=cache))
+        predicted = probabilities.argmax(axis=1)
+        for sentence, label, confidence in zip(part, predicted, probabilities.max(axis=1)):
+            yield sentence, LABELS[label], float(confidence)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sentiment tagging with a NumPy head over BERT sentence embeddings")
+    parser.add_argument('command', choices=('train', 'classify'))
+    parser.add_argument('--head', default='sentiment_head.npz', help="classifier file written by train")
+    parser.add_argument('--kind', choices=sorted(HEADS), default='softmax')
+    parser.add_argument('--min-agreement', type=int, choices=(50, 66, 75, 100), default=50,
+                        help="train: only use sentences at least this share of annotators agreed on")
+    parser.add_argument('--input', help="classify: text file with one sentence per line")
+    parser.add_argument('--output', default='sentiment.jsonl', help="classify: JSON lines output")
+    parser.add_argument('--cache', help="SQLite embedding cache shared by training and tagging")
+    parser.add_argument('--batch-size', type=int, default=emdeddings.DEFAULT_BATCH_SIZE)
+    parser.add_argument('--backend', choices=inference_backends.BACKENDS, default=emdeddings.backend_name)
+    args = parser.parse_args()
+
+    emdeddings.backend_name = args.backend
+    # classify embeds with the settings the head was trained with, so load it before the cache namespace is taken
+    head = load_head(args.head) if args.command == 'classify' else None
+    cache = EmbeddingCache(args.cache, emdeddings.cache_namespace(), DEFAULT_MAX_BYTES) if args.cache else None
+    if args.command == 'train':
+        head, report = train(args.kind, batch_size=args.batch_size, cache=cache, min_agreement=args.min_agreement)
+        save_head(head, args.head)
+        print(report)
+    else:
+        with open(args.input, 'r', encoding='utf-8', errors='replace') as file:
+            sentences = [line.strip() for line in file if line.strip()]
+        start = time.perf_counter()
+        with open(args.output, 'w', encoding='utf-8') as output:
+            for sentence, label, confidence in classify(sentences, head, batch_size=args.batch_size, cache=cache):
+                output.write(json.dumps({'sentence': sentence, 'label': label, 'confidence': confidence}) + '\n')
+        elapsed = time.perf_counter() - start
+        print(f"{len(sentences)} sentences in {elapsed:.2f}s ({len(sentences) / max(elapsed, 1e-9):.0f}/s), "
+              f"results in {args.output}")
+    if cache is not None:
+        print(cache.stats())
+        cache.close()
@@ -1,64 +1,389 @@
+import argparse
+import json
+import math
 import os
+import time
 import torch
-from transformers import BertForQuestionAnswering, BertTokenizer
+import inference_backends
+import model_registry
+from answer_cache import DEFAULT_TTL_SECONDS, AnswerCache
+from log_indexer import IncrementalLogIndexer
+from log_reader import (DEFAULT_ENCODING, DEFAULT_ERRORS, DEFAULT_READ_WORKERS, find_log_files,
+                        read_log_files)
+from log_retrieval import DEFAULT_WINDOW_LINES, BM25Index
+from log_templates import MASK, extract_template, group_templates
 
-# Function to load content from log files and train the model
-def train_log_model(log_dir):
-    # Initialize an empty list to store log content
+# Reader model and the tokenizer it was trained with, loaded once per process
+QA_MODEL_NAME = "deepset/bert-large-uncased-whole-word-masking-squad2"
+QA_TOKENIZER_NAME = "bert-large-uncased-whole-word-masking"
+
+# (question, context) pairs per forward pass, and limits on input and answer length in tokens
+DEFAULT_QA_BATCH_SIZE = 32
+MAX_SEQ_LENGTH = 384
+MAX_ANSWER_TOKENS = 30
+# Tokens shared by consecutive windows of a context longer than MAX_SEQ_LENGTH
+DEFAULT_STRIDE = 128
+
+# Candidate lines or windows handed from the retriever to the reader
+DEFAULT_CANDIDATES = 20
+
+# Questions asked about every log line
+LOG_QUESTIONS = ["What happened?", "When did it occur?"]
+
+
+def best_spans(start_logits, end_logits, context_mask, max_answer_len=MAX_ANSWER_TOKENS):
+    """Pick the best answer span of every row at once.
+
+    Scores every (start, end) pair with start <= end < start + max_answer_len inside
+    the context and takes the argmax of the flattened (batch, L, L) score matrix.
+    Returns (starts, ends, span_scores, null_scores); the null score is the [CLS]
+    "no answer" score SQuAD 2.0 models are trained to produce.
+    """
+    length = start_logits.shape[1]
+    null_scores = start_logits[:, 0] + end_logits[:, 0]
+    start_logits = start_logits.masked_fill(~context_mask, float('-inf'))
+    end_logits = end_logits.masked_fill(~context_mask, float('-inf'))
+    scores = start_logits[:, :, None] + end_logits[:, None, :]
+    band = torch.ones(length, length, dtype=torch.bool).triu().tril(max_answer_len - 1)
+    scores = scores.masked_fill(~band, float('-inf')).view(len(scores), -1)
+    span_scores, flat = scores.max(dim=1)
+    return flat // length, flat % length, span_scores, null_scores
+
+
+def no_answer():
+    """Result of a pair the reader could not answer at all, e.g. a blank context; JSON-safe (no infinities)"""
+    return {'answer': '', 'score': None, 'null_score': None, 'start_char': None, 'end_char': None, 'windows': 0}
+
+
+def json_score(score):
+    """score as written to JSON: None when there is none, e.g. -inf from an answer cached before blank pairs got None"""
+    return score if score is not None and math.isfinite(score) else None
+
+
+def truncate_question(tokenizer, question, max_tokens):
+    """Cut a question to its first max_tokens tokens so a window always has room for context"""
+    encoded = tokenizer(question, add_special_tokens=False, return_offsets_mapping=True)
+    if len(encoded['input_ids']) <= max_tokens:
+        return question
+    return question[:encoded['offset_mapping'][max_tokens - 1][1]]
+
+
+def reader_settings(max_length=MAX_SEQ_LENGTH, stride=DEFAULT_STRIDE, max_answer_len=MAX_ANSWER_TOKENS):
+    """Part of the answer cache key: the same pair read with other limits may give another answer"""
+    return f'{max_length}:{stride}:{max_answer_len}'
+
+
+def answer_batch(model, tokenizer, questions, contexts, batch_size=DEFAULT_QA_BATCH_SIZE,
+                 max_length=MAX_SEQ_LENGTH, stride=DEFAULT_STRIDE, max_answer_len=MAX_ANSWER_TOKENS,
+                 cache=None, sources=None, timings=None):
+    """Answer (question, context) pairs in padded batches.
+
+    Contexts longer than max_length are split into overlapping windows that share
+    `stride` tokens, and the best span over all windows of a pair wins. Windows
+    are sorted by length so every batch is padded only to its longest window,
+    and answers are cut from the context with the offset mapping. Returns one
+    dict per pair, in input order.
+
+    With an AnswerCache only pairs it has no fresh answer for reach the model;
+    sources (the log file of each context) let it drop answers of changed files.
+    Questions are cut to at most half of max_length tokens (less when the stride
+    needs more room), otherwise the question alone could fill a window. A Counter passed as timings accumulates seconds per 'tokenize', 'forward'
+    and 'postprocess' stage.
+    """
+    if not contexts:
+        return []
+    keep = [i for i, context in enumerate(contexts) if context.strip()]
+    if len(keep) < len(contexts):
+        # Blank lines have nothing to read: answer them without tokenizing, caching or a forward pass
+        results = [no_answer() for _ in contexts]
+        answers = answer_batch(model, tokenizer, [questions[i] for i in keep], [contexts[i] for i in keep],
+                               batch_size=batch_size, max_length=max_length, stride=stride,
+                               max_answer_len=max_answer_len, cache=cache,
+                               sources=[sources[i] for i in keep] if sources else None, timings=timings)
+        for i, answer in zip(keep, answers):
+            results[i] = answer
+        return results
+    if cache is not None:
+        settings = reader_settings(max_length, stride, max_answer_len)
+        results = cache.get_many(questions, contexts, sources=sources, settings=settings)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            missing_questions = [questions[i] for i in missing]
+            missing_contexts = [contexts[i] for i in missing]
+            missing_sources = [sources[i] for i in missing] if sources else None
+            answers = answer_batch(model, tokenizer, missing_questions, missing_contexts, batch_size=batch_size,
+                                   max_length=max_length, stride=stride, max_answer_len=max_answer_len,
+                                   timings=timings)
+            cache.put_many(missing_questions, missing_contexts, answers, sources=missing_sources,
+                           settings=settings)
+            for i, answer in zip(missing, answers):
+                results[i] = answer
+        return results
+    started = time.perf_counter()
+    # 'only_second' truncation fails when the question leaves no room for `stride` context tokens
+    max_question_tokens = min(max_length // 2, max_length - stride - 4)
+    truncated = {question: truncate_question(tokenizer, question, max_question_tokens)
+                 for question in set(questions)}
+    questions = [truncated[question] for question in questions]
+    encoded = tokenizer(questions, list(contexts), truncation='only_second', max_length=max_length,
+                        stride=stride, return_overflowing_tokens=True, return_offsets_mapping=True)
+    if timings is not None:
+        timings['tokenize'] += time.perf_counter() - started
+    window_pairs = encoded['overflow_to_sample_mapping']
+    results = [{'answer': '', 'score': float('-inf'), 'null_score': float('inf'), 'start_char': None,
+                'end_char': None, 'windows': 0} for _ in contexts]
+    order = sorted(range(len(window_pairs)), key=lambda w: len(encoded['input_ids'][w]))
+    for start in range(0, len(order), batch_size):
+        windows = order[start:start + batch_size]
+        started = time.perf_counter()
+        batch = tokenizer.pad({name: [encoded[name][w] for w in windows]
+                               for name in ('input_ids', 'token_type_ids', 'attention_mask')},
+                              return_tensors='pt')
+        context_mask = torch.zeros(batch['input_ids'].shape, dtype=torch.bool)
+        for j, w in enumerate(windows):
+            sequence_ids = encoded.sequence_ids(w)
+            context_mask[j, :len(sequence_ids)] = torch.tensor([sequence == 1 for sequence in sequence_ids])
+        padded = time.perf_counter()
+        with torch.inference_mode():
+            outputs = model(**batch)
+        forward_done = time.perf_counter()
+        starts, ends, span_scores, null_scores = best_spans(outputs.start_logits.float(), outputs.end_logits.float(),
+                                                            context_mask, max_answer_len)
+        for j, w in enumerate(windows):
+            result = results[window_pairs[w]]
+            result['windows'] += 1
+            # A pair has no answer only if the least confident "no answer" window still beats every span
+            result['null_score'] = min(result['null_score'], float(null_scores[j]))
+            if context_mask[j].any() and float(span_scores[j]) > result['score']:
+                offsets = encoded['offset_mapping'][w]
+                result.update(score=float(span_scores[j]), start_char=offsets[int(starts[j])][0],
+                              end_char=offsets[int(ends[j])][1])
+        if timings is not None:
+            timings['tokenize'] += padded - started
+            timings['forward'] += forward_done - padded
+            timings['postprocess'] += time.perf_counter() - forward_done
+
+    for result, context in zip(results, contexts):
+        if result['start_char'] is not None and result['score'] > result['null_score']:
+            result['answer'] = context[result['start_char']:result['end_char']]
+        else:
+            result.update(start_char=None, end_char=None)
+        if result['start_char'] is None and result['score'] == float('-inf'):
+            # No window had a context token to score, there is no score to report
+            result['score'] = None
+    return results
+
+
+def read_log_dir(log_dir, indexer=None, workers=DEFAULT_READ_WORKERS, encoding=DEFAULT_ENCODING,
+                 errors=DEFAULT_ERRORS):
+    """Return every line of the log files in log_dir with its (file, line number) source.
+
+    Plain, rotated and .gz/.bz2/.zst compressed logs are read concurrently. With an
+    IncrementalLogIndexer only lines appended to the uncompressed .log files (and
+    their .log.N rotations) since its last commit are returned.
+    """
     log_content = []
+    sources = []
+    if indexer is not None:
+        lines = indexer.iter_new_log_lines(log_dir)
+    else:
+        lines = read_log_files(find_log_files(log_dir), workers=workers, encoding=encoding, errors=errors)
+    for file_path, line_number, content in lines:
+        log_content.append(content)
+        sources.append((file_path, line_number))
+    return log_content, sources
+
 
-    # Loop through log files in the specified directory
-    for filename in os.listdir(log_dir):
-        if filename.endswith(".log"):  # Assuming log files have a .txt extension
-            file_path = os.path.join(log_dir, filename)
-            with open(file_path, 'r') as file:
-                for content in file.readlines():
-                    log_content.append(content)
-                    print('cool')
+# Function to load content from log files and train the model
+def train_log_model(log_dir, output_path='log_answers.jsonl', dedup_templates=False,
+                    backend=inference_backends.EAGER, batch_size=DEFAULT_QA_BATCH_SIZE, state_path=None,
+                    cache=None):
+    # With a state file only lines appended since the last run are answered, and appended to the output
+    indexer = IncrementalLogIndexer(state_path) if state_path else None
+    log_content, sources = read_log_dir(log_dir, indexer=indexer)
 
     # Load the BERT model and tokenizer
-    
-    model = BertForQuestionAnswering.from_pretrained("deepset/bert-large-uncased-whole-word-masking-squad2")
-    tokenizer = BertTokenizer.from_pretrained("bert-large-uncased-whole-word-masking")
-
-    # Preprocess the log content and train the model (simplified for illustration)
-    # In practice, you'd define your questions and perform more detailed training
-    questions = ["What happened?", "When did it occur?"]
-    for log_entry in log_content:
-        for question in questions:
-            print('question ', question)
-            print(' log_entry ', log_entry)                  
-            inputs = tokenizer(question, log_entry, return_tensors="pt")
-            outputs = model(**inputs)
-            # Store or process the answers as needed
-            answer_start = torch.argmax(outputs.start_logits)
-            answer_end = torch.argmax(outputs.end_logits)
-            print('answer start')
-            answer = tokenizer.convert_tokens_to_string(tokenizer.convert_ids_to_tokens(inputs["input_ids"][0][answer_start:answer_end]))
-            # You can store or process the 'answer' here
-            print('answer end')
+    model = inference_backends.get_backend(backend, model_registry.QUESTION_ANSWERING, QA_MODEL_NAME)
+    tokenizer = model_registry.get_tokenizer(QA_TOKENIZER_NAME)
+
+    # With dedup_templates lines that only differ in timestamps, PIDs or addresses share a
+    # template, so query one representative line per template and fan the answers out
+    representatives = range(len(log_content))
+    inverse = range(len(log_content))
+    if dedup_templates:
+        templates, representatives, inverse = group_templates(log_content)
+        print(f'{len(log_content)} log lines, {len(templates)} templates')
+    entries = [log_content[row] for row in representatives]
+
+    # Every (question, entry) pair goes through the batched reader in one call;
+    # the source file lets the answer cache drop answers once that file is replaced
+    pair_questions = [question for _ in entries for question in LOG_QUESTIONS]
+    pair_contexts = [entry for entry in entries for _ in LOG_QUESTIONS]
+    pair_sources = [sources[row][0] for row in representatives for _ in LOG_QUESTIONS]
+    pair_answers = answer_batch(model, tokenizer, pair_questions, pair_contexts, batch_size=batch_size,
+                                cache=cache, sources=pair_sources)
+
+    line_answers = [pair_answers[entry * len(LOG_QUESTIONS):(entry + 1) * len(LOG_QUESTIONS)] for entry in inverse]
+    # The template masks exactly the fields "When did it occur?" and similar questions ask about:
+    # an answer holding a timestamp, id or number is specific to its line, so the other lines
+    # of that template are asked again rather than given a copy
+    redo = [(row, q) for row, entry in enumerate(inverse) if row != representatives[entry]
+            for q in range(len(LOG_QUESTIONS)) if MASK in extract_template(line_answers[row][q]['answer'])]
+    if redo:
+        redo_answers = answer_batch(model, tokenizer, [LOG_QUESTIONS[q] for _, q in redo],
+                                    [log_content[row] for row, _ in redo], batch_size=batch_size, cache=cache,
+                                    sources=[sources[row][0] for row, _ in redo])
+        for (row, q), result in zip(redo, redo_answers):
+            line_answers[row][q] = result
+
+    # One JSON record per (log line, question)
+    with open(output_path, 'a' if indexer else 'w', encoding='utf-8') as output:
+        for log_entry, (file_path, line_number), answers in zip(log_content, sources, line_answers):
+            for question, result in zip(LOG_QUESTIONS, answers):
+                output.write(json.dumps({'file': file_path, 'line': line_number, 'log_entry': log_entry,
+                                         'question': question, 'answer': result['answer'],
+                                         'score': json_score(result['score'])}) + '\n')
+    print(f'answered {len(log_content)} log lines with {len(pair_contexts) + len(redo)} (question, line) pairs, '
+          f'results in {output_path}')
+    if indexer is not None:
+        # Only mark the delta as done once its answers are on disk
+        indexer.commit()
     # Return the trained model
     return model
 
 # Function to query the trained model and respond to queries
-def query_model(model, question, context):
-    tokenizer = BertTokenizer.from_pretrained("bert-large-uncased-whole-word-masking")
-    inputs = tokenizer(question, context, return_tensors="pt")
-    outputs = model(**inputs)
-    answer_start = torch.argmax(outputs.start_logits)
-    answer_end = torch.argmax(outputs.end_logits)
-    answer = tokenizer.convert_tokens_to_string(tokenizer.convert_ids_to_tokens(inputs["input_ids"][0][answer_start:answer_end]))
-    return answer
+def query_model(model, question, context, max_length=MAX_SEQ_LENGTH, stride=DEFAULT_STRIDE,
+                max_answer_len=MAX_ANSWER_TOKENS, cache=None, source=None):
+    # Long contexts are split into overlapping windows and scored in one batched pass;
+    # a repeated question about an unchanged context comes straight from the cache
+    tokenizer = model_registry.get_tokenizer(QA_TOKENIZER_NAME)
+    return answer_batch(model, tokenizer, [question], [context], max_length=max_length, stride=stride,
+                        max_answer_len=max_answer_len, cache=cache, sources=[source])[0]['answer']
+
+
+def log_index_origin(log_dir, window=DEFAULT_WINDOW_LINES):
+    """The log directory, window and (path, size, mtime) of every log file an index is built from"""
+    files = []
+    for path in find_log_files(log_dir):
+        stat = os.stat(path)
+        files.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+    return {'log_dir': os.path.abspath(log_dir), 'window': window, 'files': files}
+
+
+def build_log_index(log_dir, window=DEFAULT_WINDOW_LINES):
+    """BM25 index over every line (or window of lines) of the .log files in log_dir"""
+    # Taken before reading, so a file written meanwhile makes the saved index stale rather than wrongly current
+    origin = log_index_origin(log_dir, window)
+    log_content, sources = read_log_dir(log_dir)
+    index = BM25Index.build(log_content, sources, window=window)
+    index.origin = origin
+    return index
+
+
+def load_log_index(index_path, log_dir, window=DEFAULT_WINDOW_LINES):
+    """The index saved at index_path, rebuilt and saved again when log_dir, window or the log files changed.
+
+    Without a log_dir a saved index is used as it is; with neither there is no index (None).
+    """
+    if index_path and os.path.exists(index_path):
+        index = BM25Index.load(index_path)
+        if not log_dir or getattr(index, 'origin', None) == log_index_origin(log_dir, window):
+            return index
+        print(f'{index_path} was built from other log files or another window, rebuilding it')
+    if not log_dir:
+        return None
+    index = build_log_index(log_dir, window=window)
+    if index_path:
+        index.save(index_path)
+    return index
+
+
+def answer_question(question, index, k=DEFAULT_CANDIDATES, backend=inference_backends.EAGER, cache=None):
+    """Retrieve-then-read: run the reader only over the top-k BM25 candidates.
+
+    Returns the best answer with the file and line number it came from, so the
+    cost of a question depends on k rather than on the size of the log directory.
+    """
+    hits = index.search(question, k=k)
+    if not hits:
+        return best_answer([], [])
+
+    model = inference_backends.get_backend(backend, model_registry.QUESTION_ANSWERING, QA_MODEL_NAME)
+    tokenizer = model_registry.get_tokenizer(QA_TOKENIZER_NAME)
+    results = answer_batch(model, tokenizer, [question] * len(hits), [hit['text'] for hit in hits], cache=cache,
+                           sources=[hit['file'] for hit in hits])
+    return best_answer(results, hits)
+
+
+def best_answer(results, hits):
+    """Combine the reader results for retrieved hits into one answer with its source"""
+    if not hits:
+        return {'answer': '', 'score': None, 'file': None, 'line': None, 'context': None}
+    # Prefer real answers; fall back to the best retrieved candidate with an empty answer
+    answered = [(result, hit) for result, hit in zip(results, hits) if result['answer']]
+    if not answered:
+        return {'answer': '', 'score': None, 'file': hits[0]['file'], 'line': hits[0]['line'],
+                'context': hits[0]['text']}
+    result, hit = max(answered, key=lambda pair: pair[0]['score'])
+    # Windows span several lines, report the line the answer starts on
+    line = hit['line'] + hit['text'].count('\n', 0, result['start_char'])
+    return {'answer': result['answer'], 'score': result['score'], 'file': hit['file'], 'line': line,
+            'context': hit['text']}
 
 # Example usage:
 if __name__ == "__main__":
-    log_directory = "C:\\Users\\ganes\\Downloads\\log"
-    trained_model = train_log_model(log_directory)
-    
-    # Example query
-    query = "what is capital of France"
-    context = "Paris is capital of France"
-    print('executing query')
-    response = query_model(trained_model, query, context)
-    
-    print("Response:", response)
+    parser = argparse.ArgumentParser(description="Answer questions about log files")
+    parser.add_argument('log_dir', nargs='?', default="C:\\Users\\ganes\\Downloads\\log")
+    parser.add_argument('--output', default='log_answers.jsonl', help="JSON lines file the answers are written to")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_QA_BATCH_SIZE)
+    parser.add_argument('--state', help="offset checkpoint file; only lines appended since the last run are answered")
+    parser.add_argument('--backend', choices=inference_backends.BACKENDS, default=inference_backends.EAGER,
+                        help="eager PyTorch, dynamic int8 quantized PyTorch, or ONNX Runtime")
+    parser.add_argument('--ask', help="answer one question over the log directory with retrieve-then-read")
+    parser.add_argument('--index', help="BM25 index file, built from log_dir and saved here if missing or stale")
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW_LINES, help="log lines per retrieved document")
+    parser.add_argument('--candidates', type=int, default=DEFAULT_CANDIDATES)
+    parser.add_argument('--context-file', help="answer --ask over the text of this file (e.g. a long incident "
+                                               "narrative) with sliding windows instead of the log index")
+    parser.add_argument('--stride', type=int, default=DEFAULT_STRIDE)
+    parser.add_argument('--templates', action='store_true',
+                        help="ask once per log template; answers holding a masked field are still asked per line")
+    parser.add_argument('--answer-cache', help="SQLite file that keeps answers across runs")
+    parser.add_argument('--answer-ttl-hours', type=float, default=DEFAULT_TTL_SECONDS / 3600)
+    args = parser.parse_args()
+
+    # Answers are reused per (model, backend, question, context) until the source log is replaced
+    answer_cache = AnswerCache(args.answer_cache, f'{QA_MODEL_NAME}:{args.backend}',
+                               ttl_seconds=args.answer_ttl_hours * 3600)
+
+    # Load the reader while the log files are being read
+    model_registry.prewarm((model_registry.QUESTION_ANSWERING, QA_MODEL_NAME),
+                           (model_registry.TOKENIZER, QA_TOKENIZER_NAME))
+
+    if args.ask and args.context_file:
+        with open(args.context_file, 'r', encoding='utf-8') as file:
+            narrative = file.read()
+        reader = inference_backends.get_backend(args.backend, model_registry.QUESTION_ANSWERING, QA_MODEL_NAME)
+        answer = query_model(reader, args.ask, narrative, stride=args.stride, cache=answer_cache,
+                             source=args.context_file)
+        print(f"Answer: {answer}")
+    elif args.ask:
+        index = load_log_index(args.index, args.log_dir, window=args.window)
+        result = answer_question(args.ask, index, k=args.candidates, backend=args.backend, cache=answer_cache)
+        print(f"Answer: {result['answer']}")
+        print(f"Source: {result['file']}:{result['line']}")
+    else:
+        trained_model = train_log_model(args.log_dir, output_path=args.output, backend=args.backend,
+                                        batch_size=args.batch_size, state_path=args.state, cache=answer_cache,
+                                        dedup_templates=args.templates)
+
+        # Example query
+        query = "what is capital of France"
+        context = "Paris is capital of France"
+        print('executing query')
+        response = query_model(trained_model, query, context)
+
+        print("Response:", response)
+
+    print(answer_cache.stats())
+    answer_cache.close()
@@ -0,0 +1,67 @@
+import hashlib
+import os
+import numpy as np
+
+# Thumbnails of recently opened videos are kept here, within a total size budget
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'video_editor', 'thumbnails')
+DEFAULT_MAX_BYTES = 512 << 20  # 512 MiB
+
+
+def video_key(path, interval, width, height):
+    """Cache key of a video's thumbnails; a changed size or mtime means the file was rewritten"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    payload = f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\0{interval}\0{width}x{height}".encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+
+class ThumbnailCache:
+    """Timeline thumbnails of whole videos, one packed uint8 array per video.
+
+    Each entry is an uncompressed .npz holding `pixels`, an (N, height, width, 3)
+    array with every thumbnail in the top-left corner of its slot, and `sizes`,
+    the (N, 2) real width and height of each (0, 0 for frames that could not be
+    decoded). Reading an entry refreshes its mtime; once the directory exceeds
+    max_bytes the least recently used entries are deleted.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.npz')
+
+    def load(self, key):
+        """Return (pixels, sizes) for a cached video, or None"""
+        path = self._path(key)
+        try:
+            with np.load(path) as arrays:
+                pixels, sizes = arrays['pixels'], arrays['sizes']
+        except (OSError, KeyError, ValueError):
+            return None
+        os.utime(path)  # mark as recently used
+        return pixels, sizes
+
+    def save(self, key, pixels, sizes):
+        tmp_path = self._path(key) + '.tmp.npz'
+        np.savez(tmp_path, pixels=pixels, sizes=sizes)
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith('.npz') and not filename.endswith('.tmp.npz'):
+                stat = os.stat(os.path.join(self.cache_dir, filename))
+                entries.append((stat.st_mtime, stat.st_size, filename))
+        total = sum(size for _, size, _ in entries)
+        for _, size, filename in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, filename))
+            except FileNotFoundError:
+                pass
+            total -= size
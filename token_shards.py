@@ -0,0 +1,103 @@
+import argparse
+import bisect
+import itertools
+import json
+import os
+import numpy as np
+import model_registry
+
+# Lines per shard file and lines per tokenizer call while writing
+DEFAULT_SHARD_LINES = 1000000
+TOKENIZE_BATCH_LINES = 10000
+
+
+def _shard_paths(shard_dir, shard):
+    prefix = os.path.join(shard_dir, f'{shard:05d}')
+    return prefix + '.ids.npy', prefix + '.offsets.npy'
+
+
+def write_token_shards(text_file_path, shard_dir, tokenizer_name, shard_lines=DEFAULT_SHARD_LINES):
+    """Tokenize a text file once and store it as memory-mappable shards.
+
+    Each shard holds the token ids of all its lines back to back as uint16
+    (BERT vocabularies are well under 65536) plus an int64 offsets array, so
+    line i is ids[offsets[i]:offsets[i + 1]]. The attention mask is all ones
+    over that range and is rebuilt when a batch is padded, so it is not stored.
+    """
+    tokenizer = model_registry.get_tokenizer(tokenizer_name)
+    if len(tokenizer) > np.iinfo(np.uint16).max + 1:
+        raise ValueError(f"Vocabulary of {tokenizer_name} does not fit in uint16")
+
+    os.makedirs(shard_dir, exist_ok=True)
+    shards = []
+    with open(text_file_path, 'r', encoding='utf-8', newline='\n') as file:
+        for shard in itertools.count():
+            ids = []
+            lengths = []
+            while len(lengths) < shard_lines:
+                lines = list(itertools.islice(file, min(TOKENIZE_BATCH_LINES, shard_lines - len(lengths))))
+                if not lines:
+                    break
+                for line_ids in tokenizer(lines, truncation=True, padding=False)['input_ids']:
+                    ids.append(np.asarray(line_ids, dtype=np.uint16))
+                    lengths.append(len(line_ids))
+            if not lengths:
+                break
+            offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum(lengths)
+            ids_path, offsets_path = _shard_paths(shard_dir, shard)
+            np.save(ids_path, np.concatenate(ids))
+            np.save(offsets_path, offsets)
+            shards.append({'lines': len(lengths), 'tokens': int(offsets[-1])})
+
+    meta = {'source': os.path.abspath(text_file_path), 'tokenizer': tokenizer_name, 'shards': shards}
+    with open(os.path.join(shard_dir, 'meta.json'), 'w') as file:
+        json.dump(meta, file)
+    return meta
+
+
+class TokenShards:
+    """Read-only view over a shard directory; corpus[i] is the uint16 token ids of line i"""
+
+    def __init__(self, shard_dir):
+        with open(os.path.join(shard_dir, 'meta.json'), 'r') as file:
+            self.meta = json.load(file)
+        self.ids = []
+        self.offsets = []
+        for shard in range(len(self.meta['shards'])):
+            ids_path, offsets_path = _shard_paths(shard_dir, shard)
+            self.ids.append(np.load(ids_path, mmap_mode='r'))
+            self.offsets.append(np.load(offsets_path, mmap_mode='r'))
+        # First line number of every shard, for bisecting a global line number
+        self.first_lines = [0]
+        for shard in self.meta['shards']:
+            self.first_lines.append(self.first_lines[-1] + shard['lines'])
+
+    def __len__(self):
+        return self.first_lines[-1]
+
+    def __getitem__(self, line):
+        if not 0 <= line < len(self):
+            raise IndexError(line)
+        shard = bisect.bisect_right(self.first_lines, line) - 1
+        local = line - self.first_lines[shard]
+        offsets = self.offsets[shard]
+        return self.ids[shard][offsets[local]:offsets[local + 1]]
+
+    def __iter__(self):
+        for ids, offsets in zip(self.ids, self.offsets):
+            for local in range(len(offsets) - 1):
+                yield ids[offsets[local]:offsets[local + 1]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-tokenize a log or text file into uint16 token shards")
+    parser.add_argument('input')
+    parser.add_argument('shard_dir')
+    parser.add_argument('--tokenizer', default='deepset/bert-large-uncased-whole-word-masking-squad2')
+    parser.add_argument('--shard-lines', type=int, default=DEFAULT_SHARD_LINES)
+    args = parser.parse_args()
+
+    meta = write_token_shards(args.input, args.shard_dir, args.tokenizer, shard_lines=args.shard_lines)
+    print(f"{sum(s['lines'] for s in meta['shards'])} lines, "
+          f"{sum(s['tokens'] for s in meta['shards'])} tokens in {len(meta['shards'])} shards")